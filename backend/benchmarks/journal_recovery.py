@@ -0,0 +1,98 @@
+# benchmarks/journal_recovery.py
+#
+# Measures how long JournaledStorage takes to rebuild sessions after a
+# restart, once from the event log alone and once from a snapshot plus a
+# short log tail.
+#
+#   cd backend && python benchmarks/journal_recovery.py [--sessions 1000] [--players 50] [--questions 10]
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from player_store import PlayerStore  # noqa: E402
+from storage import JournaledStorage, new_question_votes  # noqa: E402
+
+OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+
+
+def new_session(num_questions):
+    return {
+        "presenter": None, "state": "LOBBY", "current_question_index": -1,
+        "questions": [
+            {"text": f"Question {q}", "options": list(OPTIONS), "answers": [0] * len(OPTIONS),
+             "votes": new_question_votes(), "correct_answer": OPTIONS[0], "tags": []}
+            for q in range(num_questions)
+        ],
+        "players": PlayerStore(), "slots": [], "nicknames": {},
+        "timer": 30, "question_start_time": None, "quiz_name": "Benchmark", "quiz_start_time": None,
+    }
+
+
+async def play(storage, num_sessions, num_players, num_questions, seed):
+    """Runs every session to its last question; returns the number of journal records."""
+    rng = random.Random(seed)
+    records = 0
+    for s in range(num_sessions):
+        code = f"S{s:05d}"
+        await storage.save_session(code, new_session(num_questions))
+        for p in range(num_players):
+            await storage.upsert_player(code, f"{code}-p{p}", f"player{p}")
+        records += 1 + num_players
+        for q in range(num_questions):
+            now = time.time()
+            await storage.transition_state(code, "QUESTION", q, question_start_time=now, quiz_start_time=now)
+            for p in range(num_players):
+                option = rng.randrange(len(OPTIONS))
+                await storage.record_vote(code, f"{code}-p{p}", q, option, rng.uniform(0.5, 30.0),
+                                          900 if option == 0 else 0)
+            await storage.transition_state(code, "RESULTS", from_state="QUESTION")
+            records += 2 + num_players
+    return records
+
+
+async def measure(directory, snapshot_every, args):
+    """Returns (records written, seconds to recover, sessions recovered)."""
+    storage = JournaledStorage(directory, snapshot_every=snapshot_every)
+    records = await play(storage, args.sessions, args.players, args.questions, args.seed)
+    if storage._snapshot_task:
+        await storage._snapshot_task
+    storage._journal.close()
+
+    started = time.perf_counter()
+    recovered = JournaledStorage(directory, snapshot_every=snapshot_every)
+    codes = await recovered.recover()
+    elapsed = time.perf_counter() - started
+    recovered._journal.close()
+    return records, elapsed, len(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery time of journaled sessions")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.players} players x {args.questions} questions\n")
+    print(f"{'journal':<22}{'records':>10}{'recovery s':>12}{'sessions':>10}")
+    # Log only, then snapshots often enough that only a short tail is replayed
+    for label, snapshot_every in (("log only", 10 ** 12), ("snapshot + log tail", 100_000)):
+        directory = tempfile.mkdtemp(prefix="journal-bench-")
+        try:
+            records, elapsed, sessions = asyncio.run(measure(directory, snapshot_every, args))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{label:<22}{records:>10}{elapsed:>12.2f}{sessions:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/player_memory.py
+#
+# Compares the memory used by a session's players and votes in the original
+# layout (a dict per player holding a dict per vote) with the compact layout
+# (PlayerStore columns + per-question vote arrays).
+#
+#   cd backend && python benchmarks/player_memory.py [--players 10000] [--questions 50]
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from player_store import PlayerStore  # noqa: E402
+from storage import new_question_votes  # noqa: E402
+
+OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+
+
+def make_votes(num_players, num_questions, seed):
+    """Generates the same (question, player, option, time, points) stream for both layouts."""
+    rng = random.Random(seed)
+    for q in range(num_questions):
+        for p in range(num_players):
+            option = rng.randrange(len(OPTIONS))
+            time_taken = rng.uniform(0.5, 30.0)
+            points = rng.choice([0, int(1000 - time_taken * 16)])
+            yield q, p, option, time_taken, points
+
+
+def build_dict_players(player_ids):
+    return {
+        pid: {"nickname": f"player{i}", "score": 0, "voted_question": -1, "votes": {}, "online": True}
+        for i, pid in enumerate(player_ids)
+    }
+
+
+def add_dict_votes(players, player_ids, questions, votes):
+    for q, p, option, time_taken, points in votes:
+        player = players[player_ids[p]]
+        questions[q]["answers"][OPTIONS[option]] += 1
+        player["votes"][q] = {"answer": OPTIONS[option], "time_taken": time_taken, "points_earned": points}
+        player["voted_question"] = q
+        player["score"] += points
+
+
+def build_compact_players(player_ids):
+    store = PlayerStore()
+    for i, pid in enumerate(player_ids):
+        store[pid] = {"nickname": f"player{i}", "score": 0, "voted_question": -1, "slot": i, "online": True}
+    return store
+
+
+def add_compact_votes(players, player_ids, questions, votes):
+    for q, p, option, time_taken, points in votes:
+        player = players[player_ids[p]]
+        question = questions[q]
+        question["answers"][option] += 1
+        columns = question["votes"]
+        columns["player_slots"].append(player["slot"])
+        columns["options"].append(option)
+        columns["time_taken"].append(time_taken)
+        columns["points"].append(points)
+        player["voted_question"] = q
+        player["score"] += points
+
+
+def measure(layout, player_ids, num_questions, seed):
+    """Returns (bytes for players, bytes for votes, seconds to apply votes)."""
+    num_players = len(player_ids)
+    tracemalloc.start()
+
+    base = tracemalloc.get_traced_memory()[0]
+    if layout == "dict":
+        players = build_dict_players(player_ids)
+        questions = [{"answers": {opt: 0 for opt in OPTIONS}} for _ in range(num_questions)]
+    else:
+        players = build_compact_players(player_ids)
+        questions = [{"answers": [0] * len(OPTIONS), "votes": new_question_votes()} for _ in range(num_questions)]
+    after_players = tracemalloc.get_traced_memory()[0]
+
+    started = time.perf_counter()
+    votes = make_votes(num_players, num_questions, seed)
+    if layout == "dict":
+        add_dict_votes(players, player_ids, questions, votes)
+    else:
+        add_compact_votes(players, player_ids, questions, votes)
+    elapsed = time.perf_counter() - started
+    after_votes = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+    return after_players - base, after_votes - after_players, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per player and per vote, dict vs compact layout")
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Player ids are uuid4 strings in the app; they are allocated up front and
+    # shared by both layouts so only the layout itself is measured.
+    player_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(args.players)]
+    num_votes = args.players * args.questions
+
+    print(f"{args.players} players x {args.questions} questions = {num_votes} votes\n")
+    print(f"{'layout':<10}{'bytes/player':>14}{'bytes/vote':>12}{'total MB':>10}{'vote time s':>13}")
+    for layout in ("dict", "compact"):
+        player_bytes, vote_bytes, elapsed = measure(layout, player_ids, args.questions, args.seed)
+        total_mb = (player_bytes + vote_bytes) / 1_000_000
+        print(f"{layout:<10}{player_bytes / args.players:>14.1f}{vote_bytes / num_votes:>12.1f}"
+              f"{total_mb:>10.1f}{elapsed:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/quiz_creation.py
+#
+# Measures how long quiz creation takes to fetch the presenter's selected
+# questions as the bank grows: the old approach (read the whole bank and
+# build a hash map) against one `$in` query on `hash`. Uses a scratch
+# collection in the configured MongoDB, which is dropped afterwards; the
+# in-process question cache is disabled so every lookup reaches MongoDB.
+#
+#   cd backend && python benchmarks/quiz_creation.py [--sizes 1000,10000,100000,1000000] [--selected 10]
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import question_bank  # noqa: E402
+from database import db_config  # noqa: E402
+from question_bank import calculate_question_hash, get_questions_by_hash, question_cache  # noqa: E402
+
+OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+INSERT_CHUNK = 10_000
+
+
+async def grow_bank(collection, current, size):
+    """Adds questions current..size-1 and returns their hashes."""
+    hashes = []
+    for start in range(current, size, INSERT_CHUNK):
+        documents = []
+        for i in range(start, min(start + INSERT_CHUNK, size)):
+            text = f"Benchmark question {i}"
+            question_hash = calculate_question_hash(text, OPTIONS)
+            hashes.append(question_hash)
+            documents.append({"text": text, "options": OPTIONS, "correct_answer": OPTIONS[0],
+                              "hash": question_hash, "tags": [f"tag{i % 20}"]})
+        await collection.insert_many(documents, ordered=False)
+    return hashes
+
+
+async def full_scan(collection, selected):
+    """The previous lookup: materialize the whole bank, then pick the selection."""
+    bank = {}
+    async for document in collection.find({}):
+        document["_id"] = str(document["_id"])
+        bank[document["hash"]] = document
+    return [bank[question_hash] for question_hash in selected if question_hash in bank]
+
+
+async def timed(lookup, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await lookup()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def run(args):
+    collection = db_config.get_db()[f"benchmark_questions_{os.getpid()}"]
+    await collection.create_index("hash", unique=True)
+    question_bank.question_collection = collection
+    question_cache.max_size = 0  # Every lookup goes to MongoDB
+    rng = random.Random(args.seed)
+
+    print(f"{args.selected} selected questions, median of {args.repeats} runs\n")
+    print(f"{'bank size':>10}{'full scan ms':>15}{'$in lookup ms':>16}")
+    hashes = []
+    try:
+        for size in sorted(int(n) for n in args.sizes.split(",")):
+            hashes += await grow_bank(collection, len(hashes), size)
+            selected = rng.sample(hashes, min(args.selected, len(hashes)))
+            # The full scan gets slow on large banks; fewer repeats keep the run bounded
+            scan_repeats = args.repeats if size <= 100_000 else 3
+            scan_ms = await timed(lambda: full_scan(collection, selected), scan_repeats)
+            lookup_ms = await timed(lambda: get_questions_by_hash(selected), args.repeats)
+            print(f"{size:>10}{scan_ms:>15.1f}{lookup_ms:>16.2f}")
+    finally:
+        await collection.drop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bank lookup latency of quiz creation by bank size")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--selected", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/shard_throughput.py
+#
+# Measures how total throughput grows with the number of shards. For each
+# shard count it starts `sharding.py`, creates quizzes through the front
+# process, connects a presenter and players to every quiz and has each player
+# repeatedly request a full state snapshot (`resync`) for a fixed time. Load
+# is generated from several client processes so the client is not the
+# bottleneck. Needs MongoDB (quiz creation reads the question bank) and the
+# `websockets` package.
+#
+#   cd backend && python benchmarks/shard_throughput.py [--shards 1,2,4] [--sessions 40] [--players 25] [--duration 10]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+import websockets
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+
+
+def create_quiz(port):
+    form = [("quiz_name", "Benchmark"), ("timer", "3600"), ("questions", "Question 1"),
+            *(("options", option) for option in OPTIONS), ("correct_answer_q1", OPTIONS[0])]
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/api/create_quiz",
+                                     data=urllib.parse.urlencode(form).encode(),
+                                     headers={"Accept": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)["session_code"]
+
+
+async def wait_for(websocket, message_type):
+    while True:
+        message = json.loads(await websocket.recv())
+        if message.get("type") == message_type:
+            return message
+
+
+async def run_player(port, session_code, nickname, started, deadline):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/{session_code}?protocol=delta") as websocket:
+        await wait_for(websocket, "snapshot")
+        await websocket.send(json.dumps({"type": "join", "nickname": nickname}))
+        await started.wait()
+        await websocket.send(json.dumps({"type": "vote", "option": 0}))
+        requests = 0
+        while time.time() < deadline:
+            await websocket.send(json.dumps({"type": "resync"}))
+            await wait_for(websocket, "snapshot")
+            requests += 1
+        return requests
+
+
+async def run_session(port, session_code, num_players, deadline):
+    started = asyncio.Event()
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/{session_code}") as presenter:
+        await presenter.send(json.dumps({"type": "join", "nickname": "Presenter"}))
+        players = [asyncio.create_task(run_player(port, session_code, f"player{p}", started, deadline))
+                   for p in range(num_players)]
+        await asyncio.sleep(1.0)  # Let everyone join before the question starts
+        await presenter.send(json.dumps({"type": "start_quiz"}))
+        started.set()
+        return sum(await asyncio.gather(*players))
+
+
+def run_client(args):
+    """One load-generating process; returns the number of completed requests."""
+    port, session_codes, num_players, deadline = args
+
+    async def run():
+        results = await asyncio.gather(*(run_session(port, code, num_players, deadline) for code in session_codes))
+        return sum(results)
+
+    return asyncio.run(run())
+
+
+def wait_for_port(port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/sessions/stats").close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def measure(shards, args):
+    """Returns completed requests per second with the given number of shards."""
+    server = subprocess.Popen([sys.executable, "sharding.py", "--shards", str(shards), "--port", str(args.port),
+                               "--log-level", "warning"], cwd=BACKEND_DIR)
+    try:
+        wait_for_port(args.port)
+        session_codes = [create_quiz(args.port) for _ in range(args.sessions)]
+        # Clients connect, join and start before the clock starts running
+        deadline = time.time() + 3.0 + args.duration
+        chunks = [(args.port, session_codes[c::args.clients], args.players, deadline) for c in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as pool:
+            requests = sum(pool.map(run_client, chunks))
+        return requests / args.duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_shards = ",".join(str(n) for n in (1, 2, 4, 8, 16) if n <= max(1, cores // 2)) or "1"
+    parser = argparse.ArgumentParser(description="Throughput of the sharded server by shard count")
+    parser.add_argument("--shards", default=default_shards, help="Comma-separated shard counts")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=max(1, cores // 2))
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.players} players, {args.clients} client processes, {cores} cores\n")
+    print(f"{'shards':<8}{'requests/s':>12}{'speedup':>10}")
+    baseline = None
+    for shards in (int(n) for n in args.shards.split(",")):
+        throughput = measure(shards, args)
+        baseline = baseline or throughput
+        print(f"{shards:<8}{throughput:>12.0f}{throughput / baseline:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# broadcast_bus.py
+
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol
+
+# --- Cross-Worker Broadcast Bus ---
+# Each uvicorn worker only holds the sockets that connected to it. When a
+# worker changes a session it publishes a small message on the bus, and every
+# worker (itself included) reacts for its own sockets: re-broadcasting the
+# state, updating its copy of the leaderboard, or setting/cancelling the
+# question timer. Messages are JSON objects:
+#
+#   {"type": "state", "origin": "<worker id>", "flush": true, "board": [...]}
+#   {"type": "timer", "origin": "<worker id>", "action": "set", "question_index": 2,
+#    "deadline": 1718000030.5, "remaining": null}
+#   {"type": "timer", "origin": "<worker id>", "action": "cancel"}
+#   {"type": "evicted", "origin": "<worker id>"}
+#
+# A "set" timer is either running until `deadline` (a Unix timestamp) or
+# paused with `remaining` seconds left; the other field is null. Every worker
+# keeps the timer to report the time left, but timers must expire exactly once
+# per session, so only the worker holding the session's timer lease (see
+# `claim_timer`) expires it. Leases are short: the owner renews them while the
+# timer exists and releases them when it is cancelled, so a lost worker's
+# timers are taken over within about `timer_lease` seconds.
+
+BusHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class BroadcastBus(Protocol):
+    """Defines the interface for the broadcast bus."""
+
+    worker_id: str
+    timer_lease: Optional[float]  # Seconds a timer lease lasts unless renewed; None if it never runs out
+
+    async def start(self) -> None:
+        """Starts receiving messages (called once the event loop is running)."""
+        ...
+
+    async def publish(self, session_code: str, message: Dict[str, Any]) -> None:
+        """Delivers a message about a session to every worker."""
+        ...
+
+    async def claim_timer(self, session_code: str) -> bool:
+        """Returns True if this worker owns (or just became owner of) the session's timer.
+
+        Renews the lease if this worker already owns it.
+        """
+        ...
+
+    async def release_timer(self, session_code: str) -> None:
+        """Gives up the session's timer lease if this worker holds it."""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class InProcessBus:
+    """Bus for a single worker: messages go straight to the handler."""
+
+    def __init__(self, handler: BusHandler):
+        self._handler = handler
+        self.worker_id = uuid.uuid4().hex
+        self.timer_lease = None
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, session_code: str, message: Dict[str, Any]) -> None:
+        await self._handler(session_code, message)
+
+    async def claim_timer(self, session_code: str) -> bool:
+        return True
+
+    async def release_timer(self, session_code: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBus:
+    """Bus shared by all workers through Redis pub/sub.
+
+    Messages for a session are published on `quiz:bus:{code}`; every worker
+    pattern-subscribes to `quiz:bus:*`. Timer leases are `quiz:{code}:timer_owner`
+    keys set with NX and an expiry of `timer_lease` seconds, renewed by the
+    owner every few seconds (see QuestionTimers) and deleted on cancel, so a
+    lost worker's timers are claimed by another worker once its lease runs out.
+    """
+
+    CHANNEL_PREFIX = "quiz:bus:"
+
+    def __init__(self, handler: BusHandler, url: str = "redis://localhost:6379/0", client=None,
+                 timer_lease: float = 15.0):
+        if client is None:
+            # Imported lazily so the redis package is only needed when this bus is used
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._handler = handler
+        self.worker_id = uuid.uuid4().hex
+        self.timer_lease = timer_lease
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+        self._listener = asyncio.create_task(self._listen())
+        print(f"Broadcast bus worker {self.worker_id} subscribed to Redis.")
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                await self._handler(channel[len(self.CHANNEL_PREFIX):], json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error handling broadcast bus message: {e}")
+
+    async def publish(self, session_code: str, message: Dict[str, Any]) -> None:
+        await self._redis.publish(f"{self.CHANNEL_PREFIX}{session_code}", json.dumps(message))
+
+    async def claim_timer(self, session_code: str) -> bool:
+        key = f"quiz:{session_code}:timer_owner"
+        lease_ms = int(self.timer_lease * 1000)
+        if await self._redis.set(key, self.worker_id, nx=True, px=lease_ms):
+            return True
+        owner = await self._redis.get(key)
+        if owner is not None and owner.decode() == self.worker_id:
+            await self._redis.pexpire(key, lease_ms)
+            return True
+        return False
+
+    async def release_timer(self, session_code: str) -> None:
+        from redis.exceptions import WatchError
+
+        key = f"quiz:{session_code}:timer_owner"
+        # Delete only our own lease: WATCH makes the check and the delete atomic
+        async with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                owner = await pipe.get(key)
+                if owner is None or owner.decode() != self.worker_id:
+                    await pipe.unwatch()
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+            except WatchError:
+                pass  # The lease changed hands meanwhile; it is not ours to delete
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.punsubscribe()
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+def create_bus(handler: BusHandler) -> BroadcastBus:
+    """Creates the bus selected by BROADCAST_BUS ("memory" or "redis")."""
+    if os.getenv("BROADCAST_BUS", "memory") == "redis":
+        return RedisBus(handler, os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                        timer_lease=float(os.getenv("TIMER_LEASE_SECONDS", "15")))
+    return InProcessBus(handler)
@@ -0,0 +1,84 @@
+# coalescer.py
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypedDict
+
+
+class CoalescerStats(TypedDict):
+    requested: int  # Number of broadcasts asked for
+    coalesced: int  # Requests folded into an already pending flush
+    flushed: int    # Broadcasts actually sent
+
+
+class BroadcastCoalescer:
+    """Folds bursts of broadcast requests for a session into one flush per tick.
+
+    Events such as votes only mark the session dirty; a single flush then goes
+    out at the next tick. State transitions call `flush_now` so they are never
+    delayed. With N voters this turns ~N² messages into N per tick.
+    """
+
+    def __init__(self, flush: Callable[[str], Awaitable[None]], tick_rate: float = 10.0):
+        self._flush = flush
+        # A tick rate of 0 disables coalescing and broadcasts on every request
+        self.tick_interval = 1.0 / tick_rate if tick_rate > 0 else 0.0
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, CoalescerStats] = {}
+        print(f"Initialized BroadcastCoalescer (tick interval: {self.tick_interval:.3f}s).")
+
+    def _session_stats(self, session_code: str) -> CoalescerStats:
+        if session_code not in self._stats:
+            self._stats[session_code] = {"requested": 0, "coalesced": 0, "flushed": 0}
+        return self._stats[session_code]
+
+    async def request(self, session_code: str):
+        """Marks the session dirty; it will be broadcast on the next tick."""
+        stats = self._session_stats(session_code)
+        stats["requested"] += 1
+
+        if not self.tick_interval:
+            await self._do_flush(session_code)
+            return
+
+        if session_code in self._pending:
+            stats["coalesced"] += 1
+            return
+
+        self._pending[session_code] = asyncio.create_task(self._flush_after_tick(session_code))
+
+    async def flush_now(self, session_code: str):
+        """Broadcasts immediately, absorbing any pending tick for the session."""
+        stats = self._session_stats(session_code)
+        stats["requested"] += 1
+
+        pending = self._pending.pop(session_code, None)
+        if pending:
+            pending.cancel()
+            stats["coalesced"] += 1
+
+        await self._do_flush(session_code)
+
+    async def _flush_after_tick(self, session_code: str):
+        await asyncio.sleep(self.tick_interval)
+        # Clear the pending slot before flushing so cancellation from flush_now
+        # can only ever interrupt the sleep, never a half-sent broadcast.
+        self._pending.pop(session_code, None)
+        await self._do_flush(session_code)
+
+    async def _do_flush(self, session_code: str):
+        self._session_stats(session_code)["flushed"] += 1
+        try:
+            await self._flush(session_code)
+        except Exception as e:
+            print(f"Error broadcasting state for {session_code}: {e}")
+
+    def get_stats(self, session_code: str) -> CoalescerStats:
+        """Returns the broadcast counters for a session."""
+        return dict(self._session_stats(session_code))
+
+    def discard(self, session_code: str):
+        """Drops any pending flush and the counters for a session."""
+        pending = self._pending.pop(session_code, None)
+        if pending:
+            pending.cancel()
+        self._stats.pop(session_code, None)
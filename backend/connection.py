@@ -1,72 +1,199 @@
 # connection.py
 import asyncio
 import json
-from typing import Dict
+import os
+from collections import deque
+from typing import Deque, Dict, Set, Tuple, TypedDict
 
 from fastapi import WebSocket
 
 
+class ConnectionStats(TypedDict):
+    connections: int
+    queued: int           # Frames waiting across all outbound queues
+    max_queue_depth: int  # Deepest single outbound queue
+    dropped: int          # Frames superseded by newer state or dropped on overflow
+    evicted: int          # Connections closed for being too slow or broken
+
+
+class ClientConnection:
+    """A WebSocket plus its bounded outbound queue, drained by a dedicated writer task.
+
+    Senders only enqueue, so a client on a bad network never stalls the rest of
+    the room. Frames marked `latest_only` (full state snapshots) replace any
+    older state frame still waiting in the queue.
+    """
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket,
+                 session_code: str, player_id: str, counters: Dict[str, int]):
+        self.websocket = websocket
+        self.session_code = session_code
+        self.player_id = player_id
+        self._manager = manager
+        self._counters = counters  # Shared per-session dropped/evicted counters
+        self._queue: Deque[Tuple[str, bool]] = deque()  # (frame, latest_only)
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._drain())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, frame: str, latest_only: bool = False):
+        """Queues a frame for delivery without waiting for the network."""
+        if latest_only and self._queue:
+            # The client is behind: drop state frames the new one supersedes
+            kept = deque(item for item in self._queue if not item[1])
+            self._counters["dropped"] += len(self._queue) - len(kept)
+            self._queue = kept
+
+        self._queue.append((frame, latest_only))
+        while len(self._queue) > self._manager.max_queue_size:
+            # Delta clients detect the resulting sequence gap and resync
+            self._queue.popleft()
+            self._counters["dropped"] += 1
+        self._wakeup.set()
+
+    async def _drain(self):
+        try:
+            while True:
+                while not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                frame, _ = self._queue.popleft()
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=self._manager.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            print(f"Evicting slow consumer {self.player_id} in room: {self.session_code}")
+            self._manager._evict(self)
+        except Exception as e:
+            # If sending fails, the connection is likely closed
+            print(f"Failed to send message to {self.player_id}: {e}")
+            self._manager._evict(self)
+
+    def close(self):
+        """Stops the writer task; pending frames are discarded."""
+        self._writer.cancel()
+        self._queue.clear()
+
+
 class ConnectionManager:
     """Manages active WebSocket connections for each quiz session."""
 
-    def __init__(self):
-        # Maps session_code to a dictionary of player_id: WebSocket
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
+    def __init__(self, max_queue_size: int = 32, send_timeout: float = 10.0):
+        # Maps session_code to a dictionary of player_id: ClientConnection
+        self.active_connections: Dict[str, Dict[str, ClientConnection]] = {}
+        # Per-session dropped/evicted counters, shared with each connection
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self.max_queue_size = max_queue_size
+        # A single send blocked longer than this disconnects the client
+        self.send_timeout = send_timeout
 
     async def connect(self, websocket: WebSocket, session_code: str, player_id: str):
         """Accepts a new WebSocket connection and adds it to the session."""
         await websocket.accept()
         if session_code not in self.active_connections:
             self.active_connections[session_code] = {}
-        self.active_connections[session_code][player_id] = websocket
+            self._counters[session_code] = {"dropped": 0, "evicted": 0}
+        self.active_connections[session_code][player_id] = ClientConnection(
+            self, websocket, session_code, player_id, self._counters[session_code]
+        )
         print(f"New connection {player_id} in room: {session_code}. Total: {len(self.active_connections[session_code])}")
 
     def disconnect(self, session_code: str, player_id: str):
         """Removes a WebSocket connection upon disconnect."""
         if session_code in self.active_connections and player_id in self.active_connections[session_code]:
-            del self.active_connections[session_code][player_id]
+            self.active_connections[session_code].pop(player_id).close()
             if not self.active_connections[session_code]:
                 del self.active_connections[session_code]
+                del self._counters[session_code]
         print(f"Connection {player_id} closed in room: {session_code}.")
 
+    def close_session(self, session_code: str):
+        """Disconnects every client of a session (e.g. when it is evicted) and closes their sockets."""
+        for connection in list(self.active_connections.get(session_code, {}).values()):
+            self.disconnect(session_code, connection.player_id)
+            task = asyncio.create_task(self._close_socket(connection.websocket, code=1001))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
     def update_player_connection(self, session_code: str, old_player_id: str, new_player_id: str):
         """Updates the connection mapping when a player reconnects with a new ID."""
-        if (session_code in self.active_connections and 
+        if (session_code in self.active_connections and
             old_player_id in self.active_connections[session_code] and
             new_player_id in self.active_connections[session_code]):
-            
+
             # Move the connection from old ID to new ID
-            self.active_connections[session_code][new_player_id] = self.active_connections[session_code][old_player_id]
-            del self.active_connections[session_code][old_player_id]
+            connection = self.active_connections[session_code].pop(old_player_id)
+            connection.player_id = new_player_id
+            self.active_connections[session_code][new_player_id] = connection
             print(f"Updated connection mapping: {old_player_id} -> {new_player_id} in room: {session_code}")
 
     async def broadcast(self, session_code: str, message: dict):
         """Broadcasts a message to all clients in a session."""
-        if session_code in self.active_connections:
-            # Create a list of tasks to send messages concurrently
-            tasks = []
-            for player_id, connection in self.active_connections[session_code].items():
-                task = self._safe_send(connection, message, player_id)
-                tasks.append(task)
-            
-            # Use asyncio.gather with return_exceptions=True to handle individual failures
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Log any exceptions that occurred
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    player_id = list(self.active_connections[session_code].keys())[i]
-                    print(f"Failed to send message to {player_id}: {result}")
-
-    async def _safe_send(self, websocket: WebSocket, message: dict, player_id: str):
-        """Safely sends a message to a single WebSocket connection."""
+        # Serialize once and share the same frame across every socket
+        await self.broadcast_text(session_code, json.dumps(message))
+
+    async def broadcast_text(self, session_code: str, frame: str, latest_only: bool = False):
+        """Queues an already-encoded frame for every client in a session."""
+        for connection in self.active_connections.get(session_code, {}).values():
+            connection.enqueue(frame, latest_only)
+
+    async def send_frames(self, session_code: str, frames: Dict[str, Tuple[str, bool]]):
+        """Queues a pre-encoded (frame, latest_only) per player; frames may be shared."""
+        connections = self.active_connections.get(session_code, {})
+        for player_id, (frame, latest_only) in frames.items():
+            connection = connections.get(player_id)
+            if connection:
+                connection.enqueue(frame, latest_only)
+
+    async def send_personal(self, session_code: str, player_id: str, message: dict):
+        """Queues a message for a single client."""
+        await self.send_personal_text(session_code, player_id, json.dumps(message))
+
+    async def send_personal_text(self, session_code: str, player_id: str, frame: str):
+        """Queues an already-encoded frame for a single client."""
+        connection = self.active_connections.get(session_code, {}).get(player_id)
+        if connection:
+            connection.enqueue(frame)
+
+    def _evict(self, connection: ClientConnection):
+        """Drops a slow or broken connection and closes its socket in the background."""
+        session_code, player_id = connection.session_code, connection.player_id
+        if self.active_connections.get(session_code, {}).get(player_id) is not connection:
+            return
+        self._counters[session_code]["evicted"] += 1
+        self.disconnect(session_code, player_id)
+
+        # The receive loop sees the close and runs the usual disconnect handling
+        task = asyncio.create_task(self._close_socket(connection.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_socket(self, websocket: WebSocket, code: int = 1013):
         try:
-            await websocket.send_text(json.dumps(message))
-        except Exception as e:
-            # If sending fails, the connection is likely closed
-            # We'll let the disconnect handler clean it up later
-            print(f"Failed to send message to {player_id}: {e}")
-            raise
+            # 1013 = "try again later", 1001 = "going away"; don't let a dead peer hold the close open
+            await asyncio.wait_for(websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def get_stats(self, session_code: str) -> ConnectionStats:
+        """Returns outbound queue depth and drop counts for a session."""
+        connections = self.active_connections.get(session_code, {})
+        counters = self._counters.get(session_code, {"dropped": 0, "evicted": 0})
+        depths = [connection.depth for connection in connections.values()]
+        return {
+            "connections": len(connections),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped": counters["dropped"],
+            "evicted": counters["evicted"],
+        }
 
 
-manager = ConnectionManager() 
\ No newline at end of file
+manager = ConnectionManager(
+    max_queue_size=int(os.getenv("OUTBOUND_QUEUE_SIZE", "32")),
+    send_timeout=float(os.getenv("SLOW_CONSUMER_TIMEOUT", "10")),
+)
@@ -0,0 +1,116 @@
+# delta_sync.py
+
+from typing import Any, Dict, Optional, TypedDict
+
+# --- Delta State Sync ---
+# Opt-in protocol where a client receives one full snapshot and afterwards
+# only the parts of the state that changed. Patches use JSON Merge Patch
+# semantics (RFC 7386): nested dicts are merged, any other value replaces the
+# old one and `null` removes a key. Every broadcast carries a sequence number
+# so clients can detect a gap and ask for a resync.
+#
+#   {"type": "snapshot", "seq": 7, "state": {...full payload...}, "me": {...}}
+#   {"type": "delta", "seq": 8, "patch": {"results": {"Paris": 12}}, "me": {...}}
+
+
+class SyncStream(TypedDict):
+    seq: int
+    payload: Dict[str, Any]  # The last payload sent for this sequence number
+
+
+def diff_payload(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds a JSON merge patch that turns `old` into `new`."""
+    patch: Dict[str, Any] = {}
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+            continue
+        old_value = old[key]
+        if old_value is value:
+            continue
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            nested = diff_payload(old_value, value)
+            if nested:
+                patch[key] = nested
+        elif old_value != value:
+            patch[key] = value
+    return patch
+
+
+class Subscriber(TypedDict):
+    view: Optional[str]               # View the client last received a snapshot of
+    me: Optional[Dict[str, Any]]      # Last personal standing sent to the client
+
+
+class DeltaSync:
+    """Tracks the last broadcast payload per session view and which connections use deltas.
+
+    Each view ("presenter", "audience") has its own sequence. A player's own
+    rank/score (`me`) is per recipient, so it travels next to the patch rather
+    than inside it: `{"type": "delta", ..., "me": {...}}`, or `{"type": "me"}`
+    when only the player's standing changed.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, Dict[str, SyncStream]] = {}
+        self._subscribers: Dict[str, Dict[str, Subscriber]] = {}
+
+    def subscribe(self, session_code: str, player_id: str) -> Subscriber:
+        """Switches a connection to the delta protocol."""
+        subscribers = self._subscribers.setdefault(session_code, {})
+        if player_id not in subscribers:
+            subscribers[player_id] = {"view": None, "me": None}
+        return subscribers[player_id]
+
+    def unsubscribe(self, session_code: str, player_id: str):
+        subscribers = self._subscribers.get(session_code)
+        if subscribers is not None:
+            subscribers.pop(player_id, None)
+            if not subscribers:
+                del self._subscribers[session_code]
+
+    def subscribers(self, session_code: str) -> Dict[str, Subscriber]:
+        return self._subscribers.get(session_code, {})
+
+    def advance(self, session_code: str, view: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Records a new broadcast payload for a view and returns the delta message for it.
+
+        Returns None when nothing changed or when no connection uses deltas
+        (in which case the diff is not computed at all).
+        """
+        streams = self._streams.setdefault(session_code, {})
+        stream = streams.get(view)
+        if stream is None:
+            streams[view] = {"seq": 0, "payload": payload}
+            return None
+
+        if not self._subscribers.get(session_code):
+            stream["seq"] += 1
+            stream["payload"] = payload
+            return None
+
+        patch = diff_payload(stream["payload"], payload)
+        if not patch:
+            return None
+
+        stream["seq"] += 1
+        stream["payload"] = payload
+        return {"type": "delta", "seq": stream["seq"], "patch": patch}
+
+    def snapshot(self, session_code: str, view: str) -> Optional[Dict[str, Any]]:
+        """Returns a full snapshot message for the last broadcast payload of a view."""
+        stream = self._streams.get(session_code, {}).get(view)
+        if stream is None:
+            return None
+        return {"type": "snapshot", "seq": stream["seq"], "state": stream["payload"]}
+
+    def discard(self, session_code: str):
+        """Forgets all sync state for a session."""
+        self._streams.pop(session_code, None)
+        self._subscribers.pop(session_code, None)
+
+
+delta_sync = DeltaSync()
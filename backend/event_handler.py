@@ -1,51 +1,58 @@
 # event_handler.py
 
+import os
 import json
 import asyncio
 import time
 import random
+from datetime import datetime
 from storage import storage
 from connection import manager
-from quiz_history import quiz_history_storage
+from coalescer import BroadcastCoalescer
+from delta_sync import delta_sync
+from leaderboard import leaderboards
+from session_actor import SessionActors
+from broadcast_bus import create_bus
+from session_lifecycle import SessionSweeper
+from question_timers import QuestionTimers
+from utils import session_codes
+from quiz_history import build_quiz_history
+from history_writer import history_writer
 
-# A dictionary to keep track of active timer tasks for each session
-timer_tasks = {}
+# Audience members only receive the top K of the leaderboard plus their own
+# standing; the presenter gets the complete list.
+LEADERBOARD_TOP_K = int(os.getenv("LEADERBOARD_TOP_K", "10"))
 
-async def _timer_task(session_code: str, question_index: int):
-    """A background task that moves the quiz to RESULTS when the timer expires."""
+VIEWS = ("presenter", "audience")
+
+
+def _view_for(public, player_id):
+    return "presenter" if public.get("presenter") == player_id else "audience"
+
+
+async def _get_leaderboard(session_code: str):
+    """Returns the session's leaderboard, reading all of its players only the first time."""
+    if session_code in leaderboards:
+        return leaderboards.get(session_code, None)
     session = await storage.get_session(session_code)
-    if not session:
-        return
-    
-    await asyncio.sleep(session["timer"])
-    
-    # After sleeping, check if the state is still the same
-    current_session = await storage.get_session(session_code)
-    if (current_session and 
-        current_session["state"] == "QUESTION" and 
-        current_session["current_question_index"] == question_index):
-        
-        print(f"Timer expired for {session_code}. Moving to results.")
-        current_session["state"] = "RESULTS"
-        await storage.save_session(session_code, current_session)
-        await broadcast_state(session_code)
+    return leaderboards.get(session_code, session) if session else None
 
 
-def _get_broadcast_payload(session, audience_count):
-    """Constructs the payload for broadcasting."""
-    # Only count online players
-    online_players = {pid: p for pid, p in session["players"].items() if p.get("online", False)}
-    
+def _get_broadcast_payload(public, board, view, timer=None):
+    """Constructs the payload for broadcasting to one view ("presenter" or "audience")."""
+    # Payload size for the audience is O(K), not O(players)
+    visible = board if view == "presenter" else board.top(LEADERBOARD_TOP_K)
+    nicknames = public["nicknames"]
+    leaderboard = {nicknames[pid]: {"score": score} for pid, score in visible if pid in nicknames}
+
     payload = {
-        "audience_count": len(online_players),
-        "state": session["state"],
-        "players": {p["nickname"]: {"score": p["score"]} for p in online_players.values()}
+        "audience_count": len(board),
+        "state": public["state"],
+        "players": leaderboard
     }
 
-    if session["state"] in ["QUESTION", "RESULTS"]:
-        q_index = session["current_question_index"]
-        question_data = session["questions"][q_index]
-        
+    question_data = public["question"]
+    if public["state"] in ["QUESTION", "RESULTS"] and question_data:
         # Create a copy of options and shuffle them for random ordering
         shuffled_options = question_data["options"].copy()
         # random.shuffle(shuffled_options)
@@ -53,195 +60,492 @@ def _get_broadcast_payload(session, audience_count):
         payload.update({
             "question": question_data["text"],
             "options": shuffled_options,
-            "question_index": q_index,
-            "total_questions": len(session["questions"]),
-            "timer": session.get("timer")
+            "question_index": public["current_question_index"],
+            "total_questions": public["total_questions"],
+            "timer": public.get("timer")
+        })
+
+    if public["state"] == "QUESTION" and timer and timer["question_index"] == public["current_question_index"]:
+        # Authoritative countdown: clients count down from here instead of from `timer`
+        payload.update({
+            "time_left": round(timer["time_left"], 1),
+            "timer_paused": timer["paused"]
         })
 
-    if session["state"] == "RESULTS":
-        q_index = session["current_question_index"]
+    if public["state"] == "RESULTS" and question_data:
         payload.update({
-            "results": session["questions"][q_index]["answers"],
-            "correct_answer": session["questions"][q_index]["correct_answer"],
-            "scores": {p["nickname"]: {"score": p["score"]} for p in online_players.values()}
+            # The view holds a copy of the counts, so the payload is a stable snapshot for delta diffing
+            "results": dict(zip(question_data["options"], question_data["answers"])),
+            "correct_answer": question_data["correct_answer"],
+            "scores": leaderboard
         })
     
     return payload
 
 
+def _with_me(frame: str, me) -> str:
+    """Appends a recipient's own standing to an already-encoded payload object."""
+    # Splicing keeps the shared part of the frame encoded only once per view
+    return f'{frame[:-1]}, "me": {json.dumps(me)}}}'
+
+
 async def broadcast_state(session_code: str):
     """Fetches the current state and broadcasts it to all clients."""
-    session = await storage.get_session(session_code)
-    if not session or not session_code in manager.active_connections:
+    if not session_code in manager.active_connections:
+        return
+    board = await _get_leaderboard(session_code)
+    if board is None:
+        return
+    # The presenter view lists every player on the board, so ask for all nicknames
+    public = await storage.get_public_view(session_code, (player_id for player_id, _ in board))
+    if not public:
         return
 
-    audience_count = len(manager.active_connections.get(session_code, {}))
-    
-    # Send different randomized options to each participant
-    for player_id, connection in manager.active_connections[session_code].items():
-        payload = _get_broadcast_payload(session, audience_count)
-        await manager._safe_send(connection, payload, player_id)
+    connections = manager.active_connections[session_code]
+
+    # Build and encode each view once per broadcast; only the small `me`
+    # standing differs between audience members.
+    standings = board.standings()
+    timer = question_timers.status(session_code)
+    payloads = {view: _get_broadcast_payload(public, board, view, timer) for view in VIEWS}
+    deltas = {view: delta_sync.advance(session_code, view, payloads[view]) for view in VIEWS}
+    delta_players = delta_sync.subscribers(session_code)
+
+    # Full frames supersede each other in a slow client's queue; deltas never do
+    full_frames = {}
+    delta_frames = {}
+    frames = {}
+    resync = []
+    for player_id in connections:
+        view = _view_for(public, player_id)
+        me = standings.get(player_id) if view == "audience" else None
+        subscriber = delta_players.get(player_id)
+
+        if subscriber is None:
+            if view not in full_frames:
+                full_frames[view] = json.dumps(payloads[view])
+            frame = _with_me(full_frames[view], me) if me else full_frames[view]
+            frames[player_id] = (frame, True)
+        elif subscriber["view"] != view:
+            # The client is synced to another view (e.g. it just became the presenter)
+            resync.append(player_id)
+        elif me != subscriber["me"]:
+            subscriber["me"] = me
+            message = {**deltas[view], "me": me} if deltas[view] else {"type": "me", "me": me}
+            frames[player_id] = (json.dumps(message), False)
+        elif deltas[view]:
+            # Delta clients get the (much smaller) patch, or nothing if nothing changed
+            if view not in delta_frames:
+                delta_frames[view] = json.dumps(deltas[view])
+            frames[player_id] = (delta_frames[view], False)
+
+    await manager.send_frames(session_code, frames)
+    for player_id in resync:
+        await send_snapshot(session_code, player_id, public)
+
 
+async def send_snapshot(session_code: str, player_id: str, public=None):
+    """Switches a connection to delta sync and sends it a full, sequenced snapshot."""
+    subscriber = delta_sync.subscribe(session_code, player_id)
+    if public is None:
+        public = await storage.get_public_view(session_code)
+    board = await _get_leaderboard(session_code)
+    if not public or board is None:
+        return
+
+    view = _view_for(public, player_id)
+    snapshot = delta_sync.snapshot(session_code, view)
+    if snapshot is None:
+        # Nothing broadcast yet: build the first payload of this view
+        full = await storage.get_public_view(session_code, (pid for pid, _ in board))
+        timer = question_timers.status(session_code)
+        delta_sync.advance(session_code, view, _get_broadcast_payload(full, board, view, timer))
+        snapshot = delta_sync.snapshot(session_code, view)
+
+    me = None
+    if view == "audience" and player_id in board:
+        me = {"rank": board.rank(player_id), "score": board.score(player_id)}
+    subscriber["view"] = view
+    subscriber["me"] = me
+    await manager.send_personal_text(session_code, player_id, json.dumps({**snapshot, "me": me}))
+
+
+# Votes, joins and leaves are coalesced into at most one broadcast per tick
+# (BROADCAST_TICK_RATE, in Hz); state transitions are flushed immediately.
+broadcast_coalescer = BroadcastCoalescer(
+    broadcast_state, tick_rate=float(os.getenv("BROADCAST_TICK_RATE", "10"))
+)
+
+
+async def request_broadcast(session_code: str):
+    """Schedules a coalesced broadcast of the session state."""
+    await broadcast_coalescer.request(session_code)
+
+
+async def start_question_timer(session_code: str, question_index: int, question_start_time: float,
+                               duration: float):
+    """Starts timing a question; the worker that owns the session's timer expires it."""
+    timer = {"question_index": question_index, "limit": duration, "paused_total": 0.0, "paused_at": None}
+    if await storage.set_question_timer(session_code, timer):
+        await _publish_question_timer(session_code, question_start_time, timer)
+
+
+async def cancel_question_timer(session_code: str):
+    """Cancels the session's question timer on every worker."""
+    await bus.publish(session_code, {"type": "timer", "origin": bus.worker_id, "action": "cancel"})
+
+
+def _question_timer(public):
+    """Returns the stored timer of the current question."""
+    timer = public.get("question_timer")
+    if timer and timer["question_index"] == public["current_question_index"]:
+        return timer
+    # Sessions whose question started before timers were stored run for the plain time limit
+    return {"question_index": public["current_question_index"], "limit": public.get("timer", 30),
+            "paused_total": 0.0, "paused_at": None}
 
-async def start_question_timer(session_code: str, session):
-    """Starts the timer for the current question."""
-    # Cancel any existing timer for this session
-    if session_code in timer_tasks:
-        timer_tasks[session_code].cancel()
 
-    session["question_start_time"] = time.time()
-    await storage.save_session(session_code, session)
+def _running_time(question_start_time, timer, now: float) -> float:
+    """Seconds a question's timer has been running, pauses excluded."""
+    started = question_start_time or now
+    return max(0.0, (timer["paused_at"] or now) - started - timer["paused_total"])
 
-    # Start a new timer
-    question_index = session["current_question_index"]
-    task = asyncio.create_task(_timer_task(session_code, question_index))
-    timer_tasks[session_code] = task
 
+def _time_left(question_start_time, timer, now: float) -> float:
+    return max(0.0, timer["limit"] - _running_time(question_start_time, timer, now))
 
-async def save_completed_quiz(session_code: str, session):
-    """Saves the completed quiz to the database."""
-    try:
-        quiz_name = session.get("quiz_name", f"Quiz {session_code}")
-        await quiz_history_storage.save_completed_quiz(session_code, quiz_name, session)
-        print(f"Quiz '{quiz_name}' completed and saved to database.")
-    except Exception as e:
-        print(f"Error saving quiz to database: {e}")
+
+async def _publish_question_timer(session_code: str, question_start_time, timer):
+    # Every worker keeps the timer state so broadcasts can carry the remaining time
+    now = time.time()
+    time_left = _time_left(question_start_time, timer, now)
+    paused = timer["paused_at"] is not None
+    await bus.publish(session_code, {"type": "timer", "origin": bus.worker_id, "action": "set",
+                                     "question_index": timer["question_index"],
+                                     "deadline": None if paused else now + time_left,
+                                     "remaining": time_left if paused else None})
+
+
+async def _adjust_question_timer(session_code: str, public, event_type: str, seconds):
+    """Pauses, resumes or extends the running question timer."""
+    if public["state"] != "QUESTION":
+        return
+    timer = dict(_question_timer(public))
+    now = time.time()
+    if event_type == "extend_timer":
+        if not isinstance(seconds, (int, float)) or isinstance(seconds, bool) or seconds <= 0:
+            return
+        timer["limit"] += seconds
+    elif event_type == "pause_timer":
+        if timer["paused_at"] is not None:
+            return
+        timer["paused_at"] = now
+    else:
+        if timer["paused_at"] is None:
+            return
+        timer["paused_total"] += now - timer["paused_at"]
+        timer["paused_at"] = None
+
+    # Stored first, so a restart resumes the timer as it is now
+    if await storage.set_question_timer(session_code, timer):
+        await _publish_question_timer(session_code, public.get("question_start_time"), timer)
+
+
+async def _expire_question_timers(expired):
+    """Hands a batch of expired (session_code, question_index) timers to the session actors."""
+    await asyncio.gather(*(
+        session_actors.submit(session_code, ("timer", None, question_index))
+        for session_code, question_index in expired
+    ))
+
+
+def save_completed_quiz(session_code: str, session):
+    """Builds the completed quiz's history document and queues it for the history writer."""
+    quiz_name = session.get("quiz_name", f"Quiz {session_code}")
+    # Built now: the session stays live after FINISHED (players can still join
+    # or reconnect), and those changes must not reach the saved history
+    history_writer.submit(build_quiz_history(session_code, quiz_name, session, datetime.now()))
+    print(f"Quiz '{quiz_name}' completed and queued for saving.")
 
 
 async def process_event(session_code: str, player_id: str, data: str):
-    """Processes a single event from a client and updates the state."""
+    """Processes a single event from a client by handing it to the session's actor."""
     event = json.loads(data)
+    await session_actors.submit(session_code, ("event", player_id, event))
+
+
+async def _apply_batch(session_code: str, batch):
+    """Applies queued items for one session in order, then broadcasts once.
+
+    Runs only on the session's actor, so items of a session never interleave.
+    Each item is written with a fine-grained storage operation sized to the
+    change; the session view is re-read only after an item that changed it.
+    """
+    public = await storage.get_public_view(session_code)
+    board = await _get_leaderboard(session_code)
+    if not public or board is None:
+        return
+    previous_position = (public["state"], public["current_question_index"])
+
+    # Leaderboard changes are collected so other workers can replay them
+    board_changes = []
+    for kind, player_id, payload in batch:
+        changed = False
+        try:
+            if kind == "event":
+                changed = await _apply_event(session_code, public, player_id, payload, board_changes)
+            elif kind == "disconnect":
+                await _apply_disconnect(session_code, public, player_id, board_changes)
+            elif kind == "timer":
+                changed = await _apply_timer_expiry(session_code, payload)
+            if changed:
+                public = await storage.get_public_view(session_code) or public
+        except Exception as e:
+            print(f"Error applying {kind} for {player_id} in {session_code}: {e}")
+    _apply_board_changes(board, board_changes)
+
+    # Every worker re-broadcasts to its own sockets. State transitions go out
+    # right away; everything else (votes, joins) is folded into the next tick.
+    await bus.publish(session_code, {
+        "type": "state",
+        "origin": bus.worker_id,
+        "flush": (public["state"], public["current_question_index"]) != previous_position,
+        "board": board_changes,
+    })
+
+
+def _apply_board_changes(board, changes):
+    """Replays ("update", player_id, score), ("move", old_id, new_id) and ("remove", player_id, None)."""
+    for op, first, second in changes:
+        if op == "update":
+            board.update(first, second)
+        elif op == "move":
+            board.move(first, second)
+        elif op == "remove":
+            board.remove(first)
+
+
+async def _on_bus_message(session_code: str, message):
+    """Reacts to a bus message for the sockets and timers of this worker."""
+    if message["type"] == "state":
+        # This worker's leaderboard copy, if it has one, catches up with the
+        # writer's; without one it is built from storage on the next broadcast.
+        if message["origin"] != bus.worker_id and session_code in leaderboards:
+            _apply_board_changes(leaderboards.get(session_code, None), message["board"])
+        if message["flush"]:
+            await broadcast_coalescer.flush_now(session_code)
+        else:
+            await request_broadcast(session_code)
+
+    elif message["type"] == "timer":
+        if message["action"] == "set":
+            question_timers.set(session_code, message["question_index"], message["deadline"],
+                                message["remaining"], owned=await bus.claim_timer(session_code))
+        else:
+            question_timers.cancel(session_code)
+            await bus.release_timer(session_code)
+
+    elif message["type"] == "evicted":
+        if message["origin"] != bus.worker_id:
+            # Drops this worker's cached copy of the session, if any
+            await storage.delete_session(session_code)
+        _discard_session(session_code)
+
+
+async def recover_sessions():
+    """Restores sessions after a restart and resumes their question timers as they were stored."""
+    for session_code in await storage.recover():
+        session_codes.reserve(session_code)
+        public = await storage.get_public_view(session_code)
+        if public and public["state"] == "QUESTION":
+            timer = _question_timer(public)
+            await _publish_question_timer(session_code, public.get("question_start_time"), timer)
+            time_left = _time_left(public.get("question_start_time"), timer, time.time())
+            paused = " (paused)" if timer["paused_at"] is not None else ""
+            print(f"Resumed timer for {session_code}: {time_left:.1f}s left{paused}.")
+
+
+async def evict_session(session_code: str):
+    """Tells every worker that a session was deleted so they drop its state."""
+    await bus.publish(session_code, {"type": "evicted", "origin": bus.worker_id})
+
+
+def _discard_session(session_code: str):
+    """Drops all of this worker's per-session state and disconnects its clients."""
+    question_timers.cancel(session_code)
+    manager.close_session(session_code)
+    broadcast_coalescer.discard(session_code)
+    delta_sync.discard(session_code)
+    leaderboards.discard(session_code)
+    session_actors.discard(session_code)
+    session_codes.release(session_code)
+
+
+async def _apply_event(session_code: str, public, player_id: str, event, board_changes) -> bool:
+    """Applies a single client event; returns True if it changed the session view."""
     event_type = event.get("type")
+    is_presenter = public.get("presenter") == player_id
 
-    session = await storage.get_session(session_code)
-    is_presenter = session.get("presenter") == player_id
+    # Delta-protocol clients ask for a full snapshot when they see a sequence gap
+    if event_type == "resync":
+        await send_snapshot(session_code, player_id, public)
+        return False
 
     # Event Handling
     if event_type == "join":
         nickname = event.get("nickname", "Anonymous")
-        
-        # Check if this username is already online
-        online_player_id = None
-        for pid, player_data in session["players"].items():
-            if player_data["nickname"] == nickname and player_data.get("online", False):
-                online_player_id = pid
-                break
-        
-        if online_player_id:
+        result = await storage.upsert_player(session_code, player_id, nickname, presenter=nickname == 'Presenter')
+        if result is None:
+            return False
+
+        if result["status"] == "taken":
             # Username is already online - send error message
-            await manager._safe_send(manager.active_connections[session_code][player_id], {
+            await manager.send_personal(session_code, player_id, {
                 "type": "join_error",
                 "message": "You are already joined from another device. Please disconnect from the other device first."
-            }, player_id)
-            return
-        
-        # Check if this username exists but is offline (reconnection)
-        offline_player_id = None
-        for pid, player_data in session["players"].items():
-            if player_data["nickname"] == nickname and not player_data.get("online", False):
-                offline_player_id = pid
-                break
-        
-        if offline_player_id:
-            # This is a reconnection - restore the player's data
-            session["players"][player_id] = session["players"][offline_player_id]
-            session["players"][player_id]["online"] = True
-            del session["players"][offline_player_id]
-            
-            # Update presenter reference if needed
-            if session.get("presenter") == offline_player_id:
-                session["presenter"] = player_id
-            
+            })
+            return False
+
+        if result["status"] == "reconnected":
+            # The player's data was restored under the new ID
+            offline_player_id = result["replaced_id"]
+            board_changes.append(("move", offline_player_id, player_id))
+            board_changes.append(("update", player_id, result["score"]))
             print(f"Player {nickname} reconnected successfully. Restored from offline player ID: {offline_player_id}")
         else:
-            # This is a new player
-            if nickname == 'Presenter' or session.get("presenter") is None:
-                session["presenter"] = player_id
-            session["players"][player_id] = {
-                "nickname": nickname, 
-                "score": 0, 
-                "voted_question": -1,
-                "votes": {},
-                "online": True
-            }
+            board_changes.append(("update", player_id, 0))
             print(f"New player {nickname} joined with ID: {player_id}")
+        # A join may have changed the presenter
+        return True
 
     elif is_presenter:
         # Cancel timer if presenter manually advances state
-        if event_type in ["show_results", "next_question"] and session_code in timer_tasks:
-            timer_tasks[session_code].cancel()
-            del timer_tasks[session_code]
+        if event_type in ["show_results", "next_question"]:
+            await cancel_question_timer(session_code)
 
+        index = public["current_question_index"]
         if event_type == "start_quiz":
-            session["state"] = "QUESTION"
-            session["current_question_index"] = 0
-            session["quiz_start_time"] = time.time()
-            await start_question_timer(session_code, session)
-        elif event_type == "show_results" and session["state"] == "QUESTION":
-            session["state"] = "RESULTS"
+            now = time.time()
+            if await storage.transition_state(session_code, "QUESTION", 0,
+                                              question_start_time=now, quiz_start_time=now):
+                await start_question_timer(session_code, 0, now, public["timer"])
+        elif event_type in ["pause_timer", "resume_timer", "extend_timer"]:
+            await _adjust_question_timer(session_code, public, event_type, event.get("seconds", 10))
+        elif event_type == "show_results":
+            await storage.transition_state(session_code, "RESULTS", from_state="QUESTION")
         elif event_type == "next_question":
-            index = session["current_question_index"]
-            if index < len(session["questions"]) - 1:
-                session["current_question_index"] += 1
-                session["state"] = "QUESTION"
-                await start_question_timer(session_code, session)
-            else:
-                session["state"] = "FINISHED"
-                # Save completed quiz to database
-                await save_completed_quiz(session_code, session)
+            if index < public["total_questions"] - 1:
+                now = time.time()
+                if await storage.transition_state(session_code, "QUESTION", index + 1, from_index=index,
+                                                  question_start_time=now):
+                    await start_question_timer(session_code, index + 1, now, public["timer"])
+            elif await storage.transition_state(session_code, "FINISHED", from_index=index):
+                # Save completed quiz to database (without holding up the FINISHED broadcast)
+                save_completed_quiz(session_code, await storage.get_session(session_code))
+        return True
 
     elif event_type == "vote":
-        index = session["current_question_index"]
+        index = public["current_question_index"]
+        question = public["question"]
         option = event.get("option")
-        player_data = session["players"].get(player_id)
-        time_limit = session.get("timer", 30)
-
-        if player_data and player_data["voted_question"] != index and 0 <= index < len(session["questions"]) and option:
-            session["questions"][index]["answers"][option] += 1
-            player_data["voted_question"] = index
-            
-            # Calculate time taken and points
-            time_taken = time.time() - session.get("question_start_time", time.time())
-            max_points = 1000
-            min_points = 500
-            
-            if time_taken >= time_limit:
-                points_earned = min_points
-            else:
-                score_range = max_points - min_points
-                points_earned = max_points - (time_taken / time_limit) * score_range
-
-            # Check if answer is correct
-            is_correct = option == session["questions"][index]["correct_answer"]
-            if is_correct:
-                player_data["score"] += int(points_earned)
-                actual_points = int(points_earned)
-            else:
-                actual_points = 0
-
-            # Store vote details
-            player_data["votes"][index] = {
-                "answer": option,
-                "time_taken": time_taken,
-                "points_earned": actual_points
-            }
-
-    await storage.save_session(session_code, session)
-    await broadcast_state(session_code)
+        if question is None:
+            return False
+        options = question["options"]
 
+        # Clients send the option index; option text is still accepted from older clients
+        if isinstance(option, str):
+            option_index = options.index(option) if option in options else -1
+        elif isinstance(option, int) and not isinstance(option, bool):
+            option_index = option
+        else:
+            option_index = -1
+        if not 0 <= option_index < len(options):
+            return False
 
-async def handle_disconnect(session_code: str, player_id: str):
-    """Handles a client disconnecting, updates session, and broadcasts."""
-    session = await storage.get_session(session_code)
+        # Calculate time taken and points from the timer's running time:
+        # pauses do not count and extensions raise the limit
+        timer = _question_timer(public)
+        time_limit = timer["limit"]
+        time_taken = _running_time(public.get("question_start_time"), timer, time.time())
+        max_points = 1000
+        min_points = 500
+
+        if time_taken >= time_limit:
+            points_earned = min_points
+        else:
+            score_range = max_points - min_points
+            points_earned = max_points - (time_taken / time_limit) * score_range
+
+        # Check if answer is correct
+        is_correct = options[option_index] == question["correct_answer"]
+        actual_points = int(points_earned) if is_correct else 0
+
+        # Storage ignores the vote if the player is unknown or already voted on this question
+        score = await storage.record_vote(session_code, player_id, index, option_index, time_taken, actual_points)
+        if score is not None and actual_points:
+            board_changes.append(("update", player_id, score))
+
+    return False
+
+
+async def _apply_timer_expiry(session_code: str, question_index: int) -> bool:
+    """Moves the quiz to RESULTS if the timed question is still running."""
+    if await storage.transition_state(session_code, "RESULTS", from_state="QUESTION", from_index=question_index):
+        print(f"Timer expired for {session_code}. Moving to results.")
+        # Clears the expired timer from the other workers' copies
+        await cancel_question_timer(session_code)
+        return True
+    return False
+
+
+async def _apply_disconnect(session_code: str, public, player_id: str, board_changes):
+    """Marks a disconnected player offline."""
     # Cancel timer if the presenter disconnects
-    if session and session.get("presenter") == player_id and session_code in timer_tasks:
-        timer_tasks[session_code].cancel()
-        del timer_tasks[session_code]
+    if public.get("presenter") == player_id:
+        await cancel_question_timer(session_code)
 
+    # Mark player as offline instead of removing them; the nickname index
+    # keeps pointing at this player so a later join restores their data
+    nickname = await storage.set_player_online(session_code, player_id, False)
+    if nickname is not None:
+        board_changes.append(("remove", player_id, None))
+        print(f"Player {nickname} marked as offline")
+
+
+async def handle_disconnect(session_code: str, player_id: str):
+    """Handles a client disconnecting, updates session, and broadcasts."""
     manager.disconnect(session_code, player_id)
-    if session and player_id in session["players"]:
-        # Mark player as offline instead of removing them
-        session["players"][player_id]["online"] = False
-        print(f"Player {session['players'][player_id]['nickname']} marked as offline")
-        await storage.save_session(session_code, session)
-        await broadcast_state(session_code) 
\ No newline at end of file
+    delta_sync.unsubscribe(session_code, player_id)
+    # Sockets of an evicted session are closed after it is gone
+    if await storage.session_exists(session_code):
+        await session_actors.submit(session_code, ("disconnect", player_id, None))
+
+
+# Every write to a session goes through its single-writer actor
+session_actors = SessionActors(_apply_batch)
+
+# Fans session changes and timer commands out to every worker (BROADCAST_BUS)
+bus = create_bus(_on_bus_message)
+
+# Deadlines of all running questions on this worker, expired in batches; timer
+# leases are renewed three times per lease so a live owner never loses one
+question_timers = QuestionTimers(
+    _expire_question_timers,
+    claim=bus.claim_timer,
+    lease_interval=bus.timer_lease / 3 if bus.timer_lease else None,
+)
+
+# Removes idle sessions per state and keeps session memory within a budget
+session_sweeper = SessionSweeper(
+    storage,
+    ttls={
+        "LOBBY": float(os.getenv("SESSION_TTL_LOBBY", "7200")),
+        "QUESTION": float(os.getenv("SESSION_TTL_QUESTION", "7200")),
+        "RESULTS": float(os.getenv("SESSION_TTL_RESULTS", "7200")),
+        "FINISHED": float(os.getenv("SESSION_TTL_FINISHED", "900")),
+    },
+    memory_budget=int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512")) * 1_000_000),
+    is_active=lambda session_code: session_code in manager.active_connections,
+    on_evict=evict_session,
+    interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "30")),
+)
@@ -0,0 +1,168 @@
+# history_writer.py
+
+import asyncio
+import glob
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, TypedDict
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from quiz_history import quiz_history_storage
+
+# --- Quiz History Writer ---
+# Finished quizzes are saved off the event path. The session actor queues the
+# finished quiz's history document; a single background task writes the
+# queued documents with batched `insert_many` calls, retrying with exponential
+# backoff. Batches that still fail are spilled to JSON-lines files in
+# `spill_dir` and written later: at startup, and whenever the database
+# accepts writes again.
+#
+# pymongo sets `_id` on each document before the first attempt, so retries
+# and re-written spill files reuse the same ids and duplicate-key errors mean
+# "already saved".
+
+_DUPLICATE_KEY = 11000
+
+class HistoryWriterStats(TypedDict):
+    queued: int
+    written: int
+    batches: int
+    retries: int
+    spilled: int       # Documents spilled to disk since startup
+    spill_files: int   # Spill files waiting to be written
+
+
+class HistoryWriter:
+    """Queues completed quizzes and writes them to MongoDB in the background."""
+
+    def __init__(self, collection, spill_dir: str, batch_size: int = 50, flush_interval: float = 0.5,
+                 max_retries: int = 5, retry_backoff: float = 1.0, spill_retry_interval: float = 60.0):
+        self.collection = collection
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # How long a lone document waits for others to batch with
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_retry_interval = spill_retry_interval
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._in_flight: List[Dict[str, Any]] = []
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stats = {"written": 0, "batches": 0, "retries": 0, "spilled": 0}
+        print(f"Initialized HistoryWriter (batches of {batch_size}, spill to {spill_dir}).")
+
+    def submit(self, document: Dict[str, Any]):
+        """Queues a history document; never blocks."""
+        self._queue.append(document)
+        self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            if self._spill_files():
+                self._wake.set()
+
+    async def close(self):
+        """Stops the writer; documents still queued get one write attempt, then are spilled."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # A batch interrupted mid-write is written again; its documents keep their ids
+        documents = self._in_flight + self._take(len(self._queue))
+        self._in_flight = []
+        if documents:
+            self._spill(await self._write(documents, retries=0))
+
+    def get_stats(self) -> HistoryWriterStats:
+        return {**self._stats, "queued": len(self._queue), "spill_files": len(self._spill_files())}
+
+    async def _run(self):
+        while True:
+            timeout = self.spill_retry_interval if self._spill_files() else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if 0 < len(self._queue) < self.batch_size:
+                    # Let quizzes finishing at about the same time share a batch
+                    await asyncio.sleep(self.flush_interval)
+                written = True
+                while self._queue:
+                    self._in_flight = self._take(self.batch_size)
+                    failed = await self._write(self._in_flight, self.max_retries)
+                    self._spill(failed)
+                    self._in_flight = []
+                    written = written and not failed
+                if written:
+                    await self._write_spilled()
+            except Exception as e:
+                print(f"Error in history writer: {e}")
+
+    def _take(self, count: int) -> List[Dict[str, Any]]:
+        """Pops up to `count` queued documents."""
+        return [self._queue.popleft() for _ in range(min(count, len(self._queue)))]
+
+    async def _write(self, documents: List[Dict[str, Any]], retries: int) -> List[Dict[str, Any]]:
+        """Inserts documents, retrying with backoff; returns the ones that could not be written."""
+        pending = documents
+        for attempt in range(retries + 1):
+            try:
+                await self.collection.insert_many(pending, ordered=False)
+                pending = []
+            except BulkWriteError as e:
+                # With ordered=False everything else was inserted; duplicates were saved before
+                failed = {error["index"] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != _DUPLICATE_KEY}
+                pending = [document for i, document in enumerate(pending) if i in failed]
+                if pending:
+                    print(f"Error saving {len(pending)} quiz histories: {e}")
+            except PyMongoError as e:
+                print(f"Error saving {len(pending)} quiz histories (attempt {attempt + 1}): {e}")
+            if not pending:
+                self._stats["written"] += len(documents)
+                self._stats["batches"] += 1
+                return []
+            if attempt < retries:
+                self._stats["retries"] += 1
+                await asyncio.sleep(min(self.retry_backoff * 2 ** attempt, 60.0))
+        return pending
+
+    def _spill_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spill_dir, "history-*.jsonl")))
+
+    def _spill(self, documents: List[Dict[str, Any]]):
+        if not documents:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"history-{time.time_ns()}.jsonl")
+        with open(f"{path}.tmp", "w") as f:
+            for document in documents:
+                f.write(json_util.dumps(document) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        self._stats["spilled"] += len(documents)
+        print(f"Spilled {len(documents)} quiz histories to {path}.")
+
+    async def _write_spilled(self):
+        """Writes spilled files oldest first; stops at the first one the database rejects."""
+        for path in self._spill_files():
+            with open(path) as f:
+                documents = [json_util.loads(line) for line in f if line.strip()]
+            if await self._write(documents, retries=0):
+                return  # The file is kept whole; documents already written count as duplicates next time
+            os.remove(path)
+            print(f"Saved {len(documents)} spilled quiz histories from {path}.")
+
+
+history_writer = HistoryWriter(
+    quiz_history_storage.collection,
+    spill_dir=os.getenv("HISTORY_SPILL_DIR", "history_spill"),
+    batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "50")),
+    max_retries=int(os.getenv("HISTORY_MAX_RETRIES", "5")),
+)
@@ -0,0 +1,164 @@
+# journal.py
+
+import asyncio
+import base64
+import glob
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+
+from player_store import PlayerStore
+
+# --- Session Journal ---
+# Optional durability for in-memory sessions. Every change applied to a
+# session is appended as one JSON line to the current event log, and every
+# `snapshot_every` records all sessions are written to a compact snapshot.
+# Files come in generations:
+#
+#   snapshot-000003.json   all sessions at the moment generation 3 began
+#   events-000003.log      changes applied since then, one record per line
+#
+# Taking a snapshot first switches appends to the next generation's log, then
+# writes the snapshot in a worker thread; older generations are deleted once
+# it is on disk. Recovery loads the newest complete snapshot and replays the
+# logs of that generation and any later one.
+
+_VOTE_COLUMNS = (("player_slots", "I"), ("options", "B"), ("time_taken", "f"), ("points", "I"))
+
+
+def _encode_array(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_array(typecode: str, data: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+    return values
+
+
+def encode_session(session) -> Dict[str, Any]:
+    """Turns a session into JSON-compatible data; vote columns are stored as packed bytes."""
+    rows: List[Any] = [None] * len(session["slots"])
+    for player_id, player in session["players"].items():
+        rows[player["slot"]] = [player_id, player["nickname"], player["score"],
+                                player["voted_question"], bool(player["online"])]
+    questions = []
+    for question in session["questions"]:
+        encoded = {key: value for key, value in question.items() if key != "votes"}
+        encoded["votes"] = {name: _encode_array(question["votes"][name]) for name, _ in _VOTE_COLUMNS}
+        questions.append(encoded)
+    return {
+        **{key: value for key, value in session.items() if key not in ("players", "questions")},
+        "players": rows,
+        "questions": questions,
+    }
+
+
+def decode_session(data: Dict[str, Any]):
+    """Rebuilds a session (with a PlayerStore and vote arrays) from `encode_session` output."""
+    players = PlayerStore()
+    for slot, row in enumerate(data["players"]):
+        player_id, nickname, score, voted_question, online = row or (f"slot:{slot}", "", 0, -1, False)
+        players[player_id] = {"nickname": nickname, "score": score, "voted_question": voted_question,
+                              "slot": slot, "online": online}
+        if row is None:
+            del players[player_id]  # A slot whose player id was retired
+    questions = []
+    for question in data["questions"]:
+        votes = {name: _decode_array(typecode, question["votes"][name]) for name, typecode in _VOTE_COLUMNS}
+        questions.append({**question, "votes": votes})
+    return {**data, "players": players, "questions": questions}
+
+
+def _write_file(path: str, text: str):
+    """Writes a file atomically: readers see either the old file or the complete new one."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class SessionJournal:
+    """Append-only event log plus periodic snapshots in one directory."""
+
+    def __init__(self, directory: str, snapshot_every: int = 50_000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self.generation = max(self._generations("events"), default=0)
+        self.records_since_snapshot = 0
+        self._snapshotting = False
+        self._log = None
+
+    def _path(self, kind: str, generation: int) -> str:
+        extension = "json" if kind == "snapshot" else "log"
+        return os.path.join(self.directory, f"{kind}-{generation:06d}.{extension}")
+
+    def _generations(self, kind: str) -> List[int]:
+        extension = "json" if kind == "snapshot" else "log"
+        paths = glob.glob(os.path.join(self.directory, f"{kind}-*.{extension}"))
+        return sorted(int(os.path.basename(path)[len(kind) + 1:-len(extension) - 1]) for path in paths)
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], Iterator[List[Any]]]:
+        """Returns the newest snapshot's encoded sessions and the log records written after it."""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        snapshots = self._generations("snapshot")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            with open(self._path("snapshot", base)) as f:
+                sessions = json.load(f)
+        logs = [generation for generation in self._generations("events") if generation >= base]
+        return sessions, self._read_logs(logs)
+
+    def _read_logs(self, generations: List[int]) -> Iterator[List[Any]]:
+        for generation in generations:
+            with open(self._path("events", generation)) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A record cut short by a crash; everything before it is intact
+                        break
+
+    def append(self, record: List[Any]):
+        """Appends one record to the current event log."""
+        if self._log is None:
+            self._log = open(self._path("events", self.generation), "a")
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        self.records_since_snapshot += 1
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return not self._snapshotting and self.records_since_snapshot >= self.snapshot_every
+
+    async def snapshot(self, sessions: Dict[str, Any]):
+        """Writes all sessions to a new snapshot and drops the generations it replaces."""
+        self._snapshotting = True
+        try:
+            # Encoding and switching logs happen without yielding, so the
+            # snapshot is exactly the state the new log starts from.
+            encoded = json.dumps({code: encode_session(session) for code, session in sessions.items()})
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self.generation += 1
+            self.records_since_snapshot = 0
+            generation = self.generation
+            open(self._path("events", generation), "a").close()
+
+            await asyncio.to_thread(_write_file, self._path("snapshot", generation), encoded)
+            for kind in ("snapshot", "events"):
+                for old in self._generations(kind):
+                    if old < generation:
+                        os.remove(self._path(kind, old))
+        finally:
+            self._snapshotting = False
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
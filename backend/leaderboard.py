@@ -0,0 +1,181 @@
+# leaderboard.py
+
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# --- Incremental Leaderboard ---
+# Online players of a session kept in score order inside an indexable skip
+# list. Score updates, removals and rank lookups are O(log N); the top K is
+# the first K nodes. Broadcasts read rankings from here instead of sorting
+# the whole player dict every time.
+
+_MAX_LEVEL = 24  # Plenty for millions of players
+_TAIL_KEY = (float("inf"),)
+
+
+class _Node:
+    __slots__ = ("key", "player_id", "score", "next", "width")
+
+    def __init__(self, key, player_id, score, level):
+        self.key = key
+        self.player_id = player_id
+        self.score = score
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[i] = number of level-0 steps from this node to next[i]
+        self.width: List[int] = [1] * level
+
+
+class Leaderboard:
+    """Online players of one session ordered by score (ties keep join order)."""
+
+    def __init__(self):
+        self._tail = _Node(_TAIL_KEY, None, None, 0)
+        self._head = _Node(None, None, None, _MAX_LEVEL)
+        self._head.next = [self._tail] * _MAX_LEVEL
+        self._keys: Dict[str, Tuple[int, int]] = {}  # player_id -> (-score, join order)
+        self._join_order: Dict[str, int] = {}
+        self._next_order = 0
+        self._size = 0
+        self._height = 1  # Levels above this are unused and skipped in searches
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._keys
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        """Yields (player_id, score) from the highest score down."""
+        node = self._head.next[0]
+        while node is not self._tail:
+            yield node.player_id, node.score
+            node = node.next[0]
+
+    def update(self, player_id: str, score: int):
+        """Adds a player or moves them to their new score."""
+        if player_id in self._keys:
+            self._remove_key(self._keys[player_id])
+        if player_id not in self._join_order:
+            self._join_order[player_id] = self._next_order
+            self._next_order += 1
+        key = (-score, self._join_order[player_id])
+        self._keys[player_id] = key
+        self._insert(key, player_id, score)
+
+    def remove(self, player_id: str):
+        """Takes a player off the board (e.g. when they go offline)."""
+        key = self._keys.pop(player_id, None)
+        if key is not None:
+            self._remove_key(key)
+
+    def move(self, old_player_id: str, new_player_id: str):
+        """Carries a reconnecting player's tie-break position over to their new ID."""
+        self.remove(old_player_id)
+        if old_player_id in self._join_order:
+            self._join_order[new_player_id] = self._join_order.pop(old_player_id)
+
+    def rank(self, player_id: str) -> Optional[int]:
+        """Returns the 1-based rank of a player, or None if they are not on the board."""
+        key = self._keys.get(player_id)
+        if key is None:
+            return None
+        node, position = self._head, 0
+        for level in reversed(range(self._height)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position + 1
+
+    def score(self, player_id: str) -> Optional[int]:
+        key = self._keys.get(player_id)
+        return -key[0] if key is not None else None
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """Returns the k highest (player_id, score) pairs."""
+        result = []
+        node = self._head.next[0]
+        while node is not self._tail and len(result) < k:
+            result.append((node.player_id, node.score))
+            node = node.next[0]
+        return result
+
+    def standings(self) -> Dict[str, Dict[str, int]]:
+        """Maps every player_id on the board to their rank and score in one pass."""
+        return {player_id: {"rank": rank, "score": score}
+                for rank, (player_id, score) in enumerate(self, start=1)}
+
+    def _insert(self, key, player_id: str, score: int):
+        height = 1
+        while height < _MAX_LEVEL and random.random() < 0.5:
+            height += 1
+        if height > self._height:
+            # Newly used head levels span the whole list
+            for level in range(self._height, height):
+                self._head.width[level] = self._size + 1
+            self._height = height
+
+        chain = [self._head] * self._height
+        steps_at_level = [0] * self._height
+        node = self._head
+        for level in reversed(range(self._height)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_node = _Node(key, player_id, score, height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self._height):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def _remove_key(self, key):
+        chain = [self._head] * self._height
+        node = self._head
+        for level in reversed(range(self._height)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self._height):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+
+class LeaderboardRegistry:
+    """Holds one Leaderboard per live session."""
+
+    def __init__(self):
+        self._boards: Dict[str, Leaderboard] = {}
+
+    def __contains__(self, session_code: str) -> bool:
+        return session_code in self._boards
+
+    def get(self, session_code: str, session) -> Leaderboard:
+        """Returns the session's leaderboard, building it from the players on first use."""
+        board = self._boards.get(session_code)
+        if board is None:
+            board = Leaderboard()
+            for player_id, player in session["players"].items():
+                if player.get("online", False):
+                    board.update(player_id, player["score"])
+            self._boards[session_code] = board
+        return board
+
+    def discard(self, session_code: str):
+        self._boards.pop(session_code, None)
+
+
+leaderboards = LeaderboardRegistry()
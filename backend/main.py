@@ -1,11 +1,35 @@
 # main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from routing import router
+from event_handler import bus, session_sweeper, question_timers, recover_sessions
+from history_writer import history_writer
+from migrations import setup_database
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the database schema and indexes up to date, start receiving
+    # session updates from other workers, restore sessions that were live
+    # before a restart, start sweeping idle sessions and writing finished
+    # quizzes (including any spilled before the restart)
+    await setup_database()
+    await bus.start()
+    await recover_sessions()
+    await session_sweeper.start()
+    await history_writer.start()
+    yield
+    await session_sweeper.close()
+    await history_writer.close()
+    await question_timers.close()
+    await bus.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Middleware ---
 # This is the new section you need to add.
@@ -0,0 +1,114 @@
+# migrations.py
+
+from datetime import datetime
+from typing import Awaitable, Callable, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+import question_bank
+from database import db_config
+from question_bank import calculate_question_hash
+
+# --- Database Setup ---
+# Runs once per process from the FastAPI lifespan, before requests are served:
+#
+#   1. Pending migrations, in version order. Applied versions are recorded in
+#      the `migrations` collection. Several processes (workers, shards) may
+#      start at the same time, so every migration must be idempotent; a
+#      version recorded twice is just a duplicate key.
+#   2. Indexes the queries rely on. `create_indexes` is a no-op for indexes
+#      that already exist. If they cannot be confirmed, the app still starts
+#      and question_bank checks for duplicate hashes itself.
+
+Migration = Tuple[int, str, Callable[..., Awaitable[None]]]
+MIGRATIONS: List[Migration] = []
+
+MIGRATIONS_COLLECTION = "migrations"
+
+
+def migration(version: int, description: str):
+    """Registers a migration; versions must be unique and are applied in ascending order."""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+
+@migration(1, "Remove duplicate questions so the hash index can be unique")
+async def _dedupe_question_hashes(db):
+    questions = db[db_config.questions_collection]
+
+    # Questions saved without a hash get one, unless another question already
+    # has it; those keep no hash (the sparse index skips them) and are kept
+    unhashed = questions.find({"hash": {"$not": {"$type": "string"}}}, {"text": 1, "options": 1})
+    async for question in unhashed:
+        text, options = question.get("text"), question.get("options")
+        question_hash = None
+        if isinstance(text, str) and isinstance(options, list) and all(isinstance(o, str) for o in options):
+            question_hash = calculate_question_hash(text, options)
+            if await questions.find_one({"hash": question_hash}, {"_id": 1}) is not None:
+                question_hash = None
+        if question_hash is not None:
+            await questions.update_one({"_id": question["_id"]}, {"$set": {"hash": question_hash}})
+        else:
+            await questions.update_one({"_id": question["_id"]}, {"$unset": {"hash": ""}})
+            print(f"Question {question['_id']} has no hash of its own; left without one.")
+
+    pipeline = [
+        {"$match": {"hash": {"$type": "string"}}},
+        {"$group": {"_id": "$hash", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    async for group in questions.aggregate(pipeline, allowDiskUse=True):
+        # Keep the oldest copy
+        duplicates = sorted(group["ids"])[1:]
+        await questions.delete_many({"_id": {"$in": duplicates}})
+        print(f"Removed {len(duplicates)} duplicates of question {group['_id']}.")
+
+
+@migration(2, "Give every question a tags list")
+async def _default_question_tags(db):
+    questions = db[db_config.questions_collection]
+    await questions.update_many({"$or": [{"tags": {"$exists": False}}, {"tags": None}]}, {"$set": {"tags": []}})
+
+
+async def run_migrations(db):
+    """Applies the migrations this database has not seen yet."""
+    applied = db[MIGRATIONS_COLLECTION]
+    done = {document["_id"] async for document in applied.find({}, {"_id": 1})}
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"Applying migration {version}: {description}")
+        await func(db)
+        try:
+            await applied.insert_one({"_id": version, "description": description, "applied_at": datetime.now()})
+        except DuplicateKeyError:
+            pass  # Another process applied it at the same time
+
+
+async def ensure_indexes(db):
+    """Creates the indexes used by question dedupe, tag search and the history listing."""
+    await db[db_config.questions_collection].create_indexes([
+        # Sparse: questions left without a hash by migration 1 are not indexed
+        IndexModel([("hash", ASCENDING)], unique=True, sparse=True, name="hash_unique"),
+        IndexModel([("tags", ASCENDING)], name="tags"),
+    ])
+    await db[db_config.quiz_history_collection].create_indexes([
+        IndexModel([("end_time", DESCENDING)], name="end_time"),
+    ])
+
+
+async def setup_database():
+    """Migrates the database and creates indexes; errors are logged so the app can still start."""
+    db = db_config.get_db()
+    try:
+        await run_migrations(db)
+        await ensure_indexes(db)
+        # Until here, question_bank checks for duplicates before inserting
+        question_bank.unique_hash_index = True
+        print("Database migrations and indexes are up to date.")
+    except PyMongoError as e:
+        print(f"Error setting up database (migrations/indexes): {e}")
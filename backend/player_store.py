@@ -0,0 +1,102 @@
+# player_store.py
+
+from array import array
+from typing import Any, Dict, Iterator, List, MutableMapping
+
+# --- Compact Player Store ---
+# Players of a session stored as parallel arrays indexed by their slot (see
+# QuizSession.slots) instead of one dict per player. The store is a mapping of
+# player_id -> player, and each player is a small record view supporting the
+# same item access as the `Player` TypedDict, so code written against
+# `session["players"][player_id]["score"]` keeps working unchanged.
+
+
+class PlayerRecord:
+    """A view of one player's row in a PlayerStore."""
+
+    __slots__ = ("_store", "slot")
+
+    def __init__(self, store: "PlayerStore", slot: int):
+        self._store = store
+        self.slot = slot
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "slot":
+            return self.slot
+        if key == "online":
+            return bool(self._store._online[self.slot])
+        try:
+            return getattr(self._store, PlayerStore._COLUMNS[key])[self.slot]
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        if key == "slot":
+            raise KeyError("A player's slot cannot change")
+        if key == "online":
+            value = 1 if value else 0
+        try:
+            getattr(self._store, PlayerStore._COLUMNS[key])[self.slot] = value
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in PlayerStore._COLUMNS or key == "slot"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+
+class PlayerStore(MutableMapping):
+    """Mapping of player_id -> player backed by per-field arrays.
+
+    A player costs one slot in each column plus the player_id -> slot entry,
+    instead of a dict per player. Reconnects just point a new player_id at the
+    existing slot; removed ids keep their slot so history stays intact.
+    """
+
+    _COLUMNS = {
+        "nickname": "_nicknames",
+        "score": "_scores",
+        "voted_question": "_voted_questions",
+        "online": "_online",
+    }
+
+    def __init__(self):
+        self._slot_by_id: Dict[str, int] = {}
+        self._nicknames: List[str] = []
+        self._scores = array("q")
+        self._voted_questions = array("i")
+        self._online = bytearray()
+
+    def __getitem__(self, player_id: str) -> PlayerRecord:
+        return PlayerRecord(self, self._slot_by_id[player_id])
+
+    def __setitem__(self, player_id: str, player):
+        if isinstance(player, PlayerRecord) and player._store is self:
+            # Moving an existing player to a new id (reconnect)
+            self._slot_by_id[player_id] = player.slot
+            return
+
+        slot = player["slot"]
+        if slot == len(self._nicknames):
+            self._nicknames.append(player["nickname"])
+            self._scores.append(player["score"])
+            self._voted_questions.append(player["voted_question"])
+            self._online.append(1 if player["online"] else 0)
+        elif 0 <= slot < len(self._nicknames):
+            record = PlayerRecord(self, slot)
+            for key in self._COLUMNS:
+                record[key] = player[key]
+        else:
+            raise ValueError(f"Player slot {slot} is out of range")
+        self._slot_by_id[player_id] = slot
+
+    def __delitem__(self, player_id: str):
+        del self._slot_by_id[player_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slot_by_id)
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
@@ -1,10 +1,119 @@
+import asyncio
 import hashlib
-from typing import List, Dict, Any
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from database import db_config
 
 # Get database and collection from centralized config
 question_collection = db_config.get_questions_collection()
 
+
+# --- Question Bank Cache ---
+# The bank is read on every page load and quiz creation but changes rarely,
+# so this process keeps a read-through copy. The first full read loads the
+# collection; adds and deletes through this module update the copy in place
+# and bump `version`. A full read that raced a write is not trusted, and the
+# copy is reloaded after `ttl` seconds to pick up changes made by other
+# processes. Banks larger than `max_size` are not cached in full: only the
+# most recently used questions are kept (for lookups by hash), and full
+# reads go to MongoDB.
+
+class QuestionBankCache:
+    """In-process copy of the question bank, keyed by question hash."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0  # Bumped by every change made through this process
+        self._questions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._complete = False
+        self._loaded_at = 0.0
+        self._tags: Optional[List[str]] = None
+        self._tags_version = -1
+        self.load_lock = asyncio.Lock()
+
+    @property
+    def complete(self) -> bool:
+        """Whether the cache holds the whole bank and is recent enough to serve full reads."""
+        return self._complete and time.monotonic() - self._loaded_at < self.ttl
+
+    def fill(self, questions: List[Dict[str, Any]], version: int):
+        """Replaces the cache with a full read of the bank that started at `version`."""
+        if version != self.version:
+            return  # A question was added or deleted while the read was running
+        if len(questions) > self.max_size:
+            self._complete = False
+            return
+        self._questions = OrderedDict((question["hash"], question) for question in questions)
+        self._complete = True
+        self._loaded_at = time.monotonic()
+
+    def questions(self) -> List[Dict[str, Any]]:
+        return list(self._questions.values())
+
+    def get(self, question_hash: str) -> Optional[Dict[str, Any]]:
+        question = self._questions.get(question_hash)
+        if question is not None and not self._complete:
+            self._questions.move_to_end(question_hash)
+        return question
+
+    def put(self, question: Dict[str, Any]):
+        self.version += 1
+        self._questions[question["hash"]] = question
+        if len(self._questions) > self.max_size:
+            # Keep the most recently used questions; the copy is no longer the whole bank
+            self._questions.popitem(last=False)
+            self._complete = False
+
+    def remember(self, question: Dict[str, Any]):
+        """Keeps a question read from MongoDB for later lookups; not a change to the bank."""
+        if self._complete:
+            return  # Only full reads (or changes) may add to a complete copy
+        self._questions[question["hash"]] = question
+        if len(self._questions) > self.max_size:
+            self._questions.popitem(last=False)
+
+    def remove(self, question_hash: str):
+        self.version += 1
+        self._questions.pop(question_hash, None)
+
+    def invalidate(self):
+        """Drops the copy after a bulk change; the next full read reloads it."""
+        self.version += 1
+        self._questions.clear()
+        self._complete = False
+
+    def tags(self) -> List[str]:
+        """Sorted unique tags of all cached questions, recomputed only after a change."""
+        if self._tags_version != self.version or self._tags is None:
+            self._tags = sorted({tag for question in self._questions.values() for tag in question.get("tags") or []})
+            self._tags_version = self.version
+        return self._tags
+
+
+# Fields of a question document the application reads
+QUESTION_PROJECTION = {"text": 1, "options": 1, "correct_answer": 1, "hash": 1, "tags": 1}
+
+# Largest page `get_questions_page` returns
+MAX_PAGE_SIZE = 200
+
+# Set by migrations.setup_database once the unique index on `hash` is known to
+# exist; until then duplicates are also checked with a read before inserting
+unique_hash_index = False
+
+question_cache = QuestionBankCache(
+    max_size=int(os.getenv("QUESTION_BANK_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("QUESTION_BANK_CACHE_TTL", "60")),
+)
+
+
 def calculate_question_hash(question_text: str, options: List[str]) -> str:
     """Calculates a SHA256 hash for a question to prevent duplicates."""
     # Sort options to ensure consistent hash
@@ -16,11 +125,6 @@ async def add_question_to_bank(question_text: str, options: List[str], correct_a
     """Adds a new question to the MongoDB question bank."""
     question_hash = calculate_question_hash(question_text, options)
 
-    # Check for duplicates
-    existing_question = await question_collection.find_one({"hash": question_hash})
-    if existing_question:
-        return {"error": "Duplicate question"}
-
     # Normalize tags - convert to lowercase and remove duplicates
     normalized_tags = []
     if tags:
@@ -33,29 +137,146 @@ async def add_question_to_bank(question_text: str, options: List[str], correct_a
         "hash": question_hash,
         "tags": normalized_tags,
     }
-    result = await question_collection.insert_one(question_doc)
-    return {"_id": str(result.inserted_id), **question_doc}
+    # Duplicates are rejected by the unique index on `hash` (see migrations.py)
+    if not unique_hash_index and await question_collection.find_one({"hash": question_hash}, {"_id": 1}):
+        return {"error": "Duplicate question"}
+    try:
+        result = await question_collection.insert_one(question_doc)
+    except DuplicateKeyError:
+        return {"error": "Duplicate question"}
+    question_doc["_id"] = str(result.inserted_id)
+    question_cache.put(question_doc)
+    return dict(question_doc)
+
+async def find_existing_hashes(question_hashes: List[str]) -> Set[str]:
+    """Returns which of the given hashes are already in the bank, with one query."""
+    if not question_hashes:
+        return set()
+    cursor = question_collection.find({"hash": {"$in": question_hashes}}, {"hash": 1, "_id": 0})
+    return {document["hash"] async for document in cursor}
+
+async def insert_questions(question_docs: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Inserts questions with one unordered bulk write.
+
+    Returns the position and error message of each document that was not
+    inserted; duplicates (by the unique `hash` index) are "Duplicate question".
+    """
+    if not question_docs:
+        return {}
+    failed = {}
+    try:
+        await question_collection.bulk_write([InsertOne(doc) for doc in question_docs], ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failed[error["index"]] = "Duplicate question" if error.get("code") == 11000 else error.get("errmsg", "Write failed")
+    question_cache.invalidate()
+    return failed
 
 async def get_all_questions() -> List[Dict[str, Any]]:
-    """Retrieves all questions from the question bank."""
+    """Retrieves all questions from the question bank (served from the cache when possible).
+
+    The returned documents are shared with the cache and must not be modified.
+    """
+    if question_cache.complete:
+        return question_cache.questions()
+    async with question_cache.load_lock:
+        # Another request may have loaded the bank while this one waited
+        if question_cache.complete:
+            return question_cache.questions()
+        version = question_cache.version
+        questions = []
+        cursor = question_collection.find({})
+        async for document in cursor:
+            document["_id"] = str(document["_id"])
+            questions.append(document)
+        question_cache.fill(questions, version)
+        return questions
+
+async def get_questions_by_hash(question_hashes: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Looks up questions by hash with at most one query.
+
+    Returns the questions found, in the order of `question_hashes`, and the
+    hashes that are not in the bank.
+    """
+    found = {}
+    misses = []
+    for question_hash in dict.fromkeys(question_hashes):
+        question = question_cache.get(question_hash)
+        if question is None:
+            misses.append(question_hash)
+        else:
+            found[question_hash] = question
+
+    if misses:
+        cursor = question_collection.find({"hash": {"$in": misses}}, QUESTION_PROJECTION)
+        async for document in cursor:
+            document["_id"] = str(document["_id"])
+            found[document["hash"]] = document
+            question_cache.remember(document)
+
+    questions = [found[question_hash] for question_hash in question_hashes if question_hash in found]
+    missing = [question_hash for question_hash in dict.fromkeys(question_hashes) if question_hash not in found]
+    return questions, missing
+
+def _questions_filter(tags: Optional[List[str]], search: Optional[str] = None) -> Dict[str, Any]:
+    """Matches questions with any of `tags` whose text contains `search` (both case-insensitive)."""
+    query = {}
+    if tags:
+        query["tags"] = {"$in": [tag.lower() for tag in tags]}
+    if search:
+        query["text"] = {"$regex": re.escape(search), "$options": "i"}
+    return query
+
+def _matches_search(question: Dict[str, Any], search: Optional[str]) -> bool:
+    return not search or search.lower() in (question.get("text") or "").lower()
+
+async def get_questions_page(limit: int, after: Optional[str] = None, tags: Optional[List[str]] = None,
+                             search: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Returns one page of questions in insertion order and the cursor of the next page (None on the last).
+
+    Keyset pagination on `_id`: a page costs the same however deep it is.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = _questions_filter(tags, search)
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except (InvalidId, TypeError):
+            raise ValueError(f"Invalid cursor: {after}")
+
+    # One extra document tells whether there is a next page
+    cursor = question_collection.find(query, QUESTION_PROJECTION).sort("_id", 1).limit(limit + 1)
     questions = []
-    cursor = question_collection.find({})
     async for document in cursor:
         document["_id"] = str(document["_id"])
         questions.append(document)
-    return questions
+    next_cursor = questions[limit - 1]["_id"] if len(questions) > limit else None
+    return questions[:limit], next_cursor
+
+async def stream_questions(tags: Optional[List[str]] = None,
+                           search: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yields matching questions as the database cursor produces them, without collecting them."""
+    cursor = question_collection.find(_questions_filter(tags, search), QUESTION_PROJECTION).sort("_id", 1)
+    async for document in cursor:
+        document["_id"] = str(document["_id"])
+        yield document
 
-async def search_questions_by_tags(tags: List[str]) -> List[Dict[str, Any]]:
-    """Search questions by tags (case-insensitive)."""
-    if not tags:
+async def search_questions_by_tags(tags: List[str], search: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Search questions by tags, and optionally by text (case-insensitive)."""
+    if not tags and not search:
         return await get_all_questions()
     
     # Convert tags to lowercase for case-insensitive search
     normalized_tags = [tag.lower() for tag in tags]
+    if question_cache.complete:
+        wanted = set(normalized_tags)
+        return [question for question in question_cache.questions()
+                if (not wanted or wanted.intersection(question.get("tags") or [])) and _matches_search(question, search)]
     
     # Find questions that have any of the specified tags
     questions = []
-    cursor = question_collection.find({"tags": {"$in": normalized_tags}})
+    cursor = question_collection.find(_questions_filter(normalized_tags, search))
     async for document in cursor:
         document["_id"] = str(document["_id"])
         questions.append(document)
@@ -63,6 +284,8 @@ async def search_questions_by_tags(tags: List[str]) -> List[Dict[str, Any]]:
 
 async def get_all_tags() -> List[str]:
     """Get all unique tags from the question bank."""
+    if question_cache.complete:
+        return question_cache.tags()
     pipeline = [
         {"$unwind": "$tags"},
         {"$group": {"_id": "$tags"}},
@@ -78,4 +301,5 @@ async def get_all_tags() -> List[str]:
 async def delete_question_from_bank(question_id: str):
     """Deletes a question from the bank by its hash."""
     await question_collection.delete_one({"hash": question_id})
+    question_cache.remove(question_id)
     return {"status": "deleted"} 
\ No newline at end of file
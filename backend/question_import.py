@@ -0,0 +1,198 @@
+# question_import.py
+
+import asyncio
+import hashlib
+import itertools
+import os
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from question_bank import find_existing_hashes, insert_questions
+
+# --- Bulk Question Import ---
+# CSV/Excel uploads are imported chunk by chunk so memory stays bounded
+# however long the file is. For each chunk of rows:
+#
+#   1. Columns are validated and normalized with vectorized pandas operations
+#      and every row's question hash is computed in one pass.
+#   2. Duplicates within the chunk are dropped; duplicates against the bank
+#      (including earlier chunks, which are already written) are found with a
+#      single `$in` query.
+#   3. The remaining questions are written with one unordered bulk write.
+#
+# Parsing and normalizing run in a worker thread; a progress report is
+# produced after every chunk.
+
+REQUIRED_COLUMNS = ['Question', 'Option1', 'Option2', 'Option3', 'Option4', 'CorrectAnswer']
+OPTION_COLUMNS = ['Option1', 'Option2', 'Option3', 'Option4']
+
+# Row errors kept for the report; further errors are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportProgress(TypedDict):
+    rows: int             # Rows read so far
+    success_count: int
+    error_count: int
+    errors: List[str]     # The first MAX_REPORTED_ERRORS row errors
+    progress: Optional[float]  # Share of the file read (None when unknown)
+    done: bool
+
+
+def read_question_chunks(file: BinaryIO, extension: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Returns the rows of an uploaded file as DataFrames of at most `chunk_rows` rows.
+
+    All cells are strings ("" when empty). The first chunk is read right
+    away so missing columns raise ValueError before the import starts.
+    """
+    if extension == 'csv':
+        chunks = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    elif extension == 'xlsx':
+        chunks = _xlsx_chunks(file, chunk_rows)
+    else:
+        # Legacy .xls workbooks can only be read whole
+        frame = pd.read_excel(file, dtype=str).fillna("")
+        chunks = (frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows))
+
+    first = next(chunks, None)
+    if first is None:
+        return iter(())
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in first.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+    return itertools.chain([first], chunks)
+
+
+def _xlsx_chunks(file: BinaryIO, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Streams the first sheet of a workbook without loading it whole (openpyxl read-only mode)."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else "" for name in next(rows, ())]
+        start = 0
+        while True:
+            batch = [["" if value is None else str(value) for value in row] for row in itertools.islice(rows, chunk_rows)]
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)))
+            start += len(batch)
+    finally:
+        workbook.close()
+
+
+def question_hashes(texts: pd.Series, options: pd.DataFrame) -> List[str]:
+    """Batch version of question_bank.calculate_question_hash for stripped texts and options."""
+    # Options are sorted per row as-is (case-sensitive, like sorted()) and then joined
+    sorted_options = np.sort(options.to_numpy(dtype=str), axis=1)
+    joined = sorted_options[:, 0]
+    for column in range(1, sorted_options.shape[1]):
+        joined = np.char.add(joined, sorted_options[:, column])
+    keys = texts.str.lower() + pd.Series(joined, index=texts.index).str.lower()
+    return [hashlib.sha256(key.encode()).hexdigest() for key in keys]
+
+
+def _normalize_tags(tags: str) -> List[str]:
+    return list(dict.fromkeys(tag.strip() for tag in tags.lower().split(',') if tag.strip()))
+
+
+def normalize_chunk(chunk: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[int], Dict[int, str]]:
+    """Validates one chunk of rows.
+
+    Returns the question documents of the valid rows, their row indexes, and
+    an error message per invalid row index. Rows without question text are
+    skipped silently.
+    """
+    columns = {col: chunk[col].astype(str).str.strip() for col in REQUIRED_COLUMNS}
+    texts = columns['Question']
+    options = pd.DataFrame({col: columns[col] for col in OPTION_COLUMNS})
+    correct = columns['CorrectAnswer']
+    tags = chunk['Tags'].astype(str) if 'Tags' in chunk.columns else pd.Series("", index=chunk.index)
+
+    skipped = texts == ""
+    bad_options = (options == "").any(axis=1)
+    missing_correct = correct == ""
+    not_an_option = ~options.eq(correct, axis=0).any(axis=1)
+    reasons = pd.Series(np.select(
+        [skipped, bad_options, missing_correct, not_an_option],
+        ["", "Invalid options", "Missing correct answer", "Correct answer must be one of the options"],
+        default="",
+    ), index=chunk.index)
+    valid = ~skipped & (reasons == "")
+
+    texts, options, correct, tags = texts[valid], options[valid], correct[valid], tags[valid]
+    hashes = pd.Series(question_hashes(texts, options), index=texts.index, dtype=object)
+    duplicates = hashes.duplicated()
+    reasons[duplicates[duplicates].index] = "Duplicate question"
+
+    # Plain lists are much faster to walk than Series when building the documents
+    keep = ~duplicates
+    documents = [
+        {"text": text, "options": row, "correct_answer": answer, "hash": question_hash,
+         "tags": _normalize_tags(row_tags)}
+        for text, row, answer, question_hash, row_tags in zip(
+            texts[keep].tolist(), options[keep].to_numpy(dtype=object).tolist(), correct[keep].tolist(),
+            hashes[keep].tolist(), tags[keep].tolist())
+    ]
+    errors = {index: reason for index, reason in reasons.items() if reason}
+    return documents, list(hashes[keep].index), errors
+
+
+async def import_questions(chunks: Iterator[pd.DataFrame],
+                           progress: Callable[[], Optional[float]] = lambda: None) -> AsyncIterator[ImportProgress]:
+    """Imports questions chunk by chunk, yielding a progress report after each chunk and a final one."""
+    report: ImportProgress = {"rows": 0, "success_count": 0, "error_count": 0, "errors": [],
+                              "progress": 0.0, "done": False}
+
+    def record_errors(errors: Dict[int, str]):
+        report["error_count"] += len(errors)
+        for index in sorted(errors):
+            if len(report["errors"]) >= MAX_REPORTED_ERRORS:
+                break
+            report["errors"].append(f"Row {index + 1}: {errors[index]}")
+
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        documents, row_indexes, errors = await asyncio.to_thread(normalize_chunk, chunk)
+
+        existing = await find_existing_hashes([doc["hash"] for doc in documents])
+        new_documents, new_indexes = [], []
+        for doc, index in zip(documents, row_indexes):
+            if doc["hash"] in existing:
+                errors[index] = "Duplicate question"
+            else:
+                new_documents.append(doc)
+                new_indexes.append(index)
+        failed = await insert_questions(new_documents)
+        errors.update({new_indexes[position]: message for position, message in failed.items()})
+
+        report["rows"] += len(chunk)
+        report["success_count"] += len(new_documents) - len(failed)
+        record_errors(errors)
+        report["progress"] = progress()
+        print(f"Question import: {report['rows']} rows read, {report['success_count']} added, "
+              f"{report['error_count']} errors.")
+        yield {**report, "errors": list(report["errors"])}
+
+    report["progress"] = 1.0
+    report["done"] = True
+    yield report
+
+
+def file_progress(file: BinaryIO) -> Callable[[], Optional[float]]:
+    """Returns a function reporting the share of a seekable file read so far."""
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+
+    def progress() -> Optional[float]:
+        try:
+            return min(1.0, file.tell() / size) if size else None
+        except (OSError, ValueError):
+            return None
+    return progress
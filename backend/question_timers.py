@@ -0,0 +1,149 @@
+# question_timers.py
+
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypedDict
+
+# --- Question Timers ---
+# One scheduler owns the deadlines of every running question instead of one
+# sleeping asyncio task per question. Deadlines sit in a min-heap; a single
+# task sleeps until the earliest one and expires everything that is due in
+# one batch. Changing a timer (extend, pause, cancel) just replaces the
+# session's entry; its old heap item is skipped when it surfaces.
+#
+# Every worker keeps the timer state of its sessions so it can put the
+# remaining time in broadcasts, but only entries marked `owned` are put on
+# the heap and expire (see broadcast_bus.claim_timer). With `claim` and
+# `lease_interval` set, a second task re-claims every timer each interval:
+# owners renew their lease, and the other workers take over the timers of a
+# worker that stopped renewing.
+
+
+class TimerStatus(TypedDict):
+    question_index: int
+    time_left: float
+    paused: bool
+
+
+class _Entry:
+    __slots__ = ("question_index", "deadline", "remaining", "owned", "seq")
+
+    def __init__(self, question_index: int, deadline: Optional[float], remaining: Optional[float],
+                 owned: bool, seq: int):
+        self.question_index = question_index
+        self.deadline = deadline      # Wall-clock expiry time; None while paused
+        self.remaining = remaining    # Seconds left while paused
+        self.owned = owned
+        self.seq = seq
+
+
+class QuestionTimers:
+    """Deadlines of all running questions, expired in batches by one task."""
+
+    def __init__(self, on_expire: Callable[[List[Tuple[str, int]]], Awaitable[None]],
+                 claim: Optional[Callable[[str], Awaitable[bool]]] = None,
+                 lease_interval: Optional[float] = None):
+        self._on_expire = on_expire
+        self._claim = claim
+        self.lease_interval = lease_interval  # Seconds between lease renewals; None if leases never run out
+        self._entries: Dict[str, _Entry] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lease_task: Optional[asyncio.Task] = None
+        self._expiring = set()
+
+    def set(self, session_code: str, question_index: int, deadline: Optional[float] = None,
+            remaining: Optional[float] = None, owned: bool = True):
+        """Sets a session's timer: running until `deadline`, or paused with `remaining` seconds."""
+        self._seq += 1
+        entry = _Entry(question_index, deadline, remaining, owned, self._seq)
+        self._entries[session_code] = entry
+        if owned and deadline is not None:
+            heapq.heappush(self._heap, (deadline, entry.seq, session_code))
+            if self._heap[0][1] == entry.seq:
+                # The new deadline is the earliest: re-arm the sleeping task
+                self._wake.set()
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+        if self._lease_task is None and self._claim and self.lease_interval:
+            self._lease_task = asyncio.create_task(self._renew_leases())
+
+    def set_owned(self, session_code: str, owned: bool):
+        """Marks whether this worker owns a session's timer (and so expires it)."""
+        entry = self._entries.get(session_code)
+        if entry is None or entry.owned == owned:
+            return
+        entry.owned = owned
+        if owned and entry.deadline is not None:
+            heapq.heappush(self._heap, (entry.deadline, entry.seq, session_code))
+            self._wake.set()
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+
+    def cancel(self, session_code: str):
+        self._entries.pop(session_code, None)
+
+    def status(self, session_code: str) -> Optional[TimerStatus]:
+        """Returns the timer of a session with its remaining time, or None if none is set."""
+        entry = self._entries.get(session_code)
+        if entry is None:
+            return None
+        if entry.deadline is None:
+            return {"question_index": entry.question_index, "time_left": entry.remaining, "paused": True}
+        return {"question_index": entry.question_index,
+                "time_left": max(0.0, entry.deadline - time.time()), "paused": False}
+
+    def __contains__(self, session_code: str) -> bool:
+        return session_code in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, session_code = heapq.heappop(self._heap)
+                entry = self._entries.get(session_code)
+                if entry is None or entry.seq != seq or not entry.owned:
+                    continue  # Replaced, cancelled or handed over since it was scheduled
+                del self._entries[session_code]
+                due.append((session_code, entry.question_index))
+            if due:
+                task = asyncio.create_task(self._on_expire(due))
+                self._expiring.add(task)
+                task.add_done_callback(self._expiring.discard)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(self.lease_interval)
+            for session_code in list(self._entries):
+                if session_code not in self._entries:
+                    continue  # Cancelled while an earlier lease was renewed
+                try:
+                    owned = await self._claim(session_code)
+                except Exception as e:
+                    print(f"Error renewing timer lease of {session_code}: {e}")
+                    continue
+                if owned and session_code in self._entries and not self._entries[session_code].owned:
+                    print(f"Took over the question timer of {session_code}.")
+                self.set_owned(session_code, owned)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._lease_task:
+            self._lease_task.cancel()
+            self._lease_task = None
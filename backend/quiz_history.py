@@ -31,6 +31,64 @@ class QuizHistory(TypedDict):
     final_leaderboard: Dict[str, int]  # nickname -> final score
     total_players: int
 
+def build_quiz_history(session_code: str, quiz_name: str, session_data: dict,
+                       end_time: Optional[datetime] = None) -> QuizHistory:
+    """Builds the history document of a completed quiz from its session data."""
+    # Extract data from session
+    slots = session_data["slots"]
+    questions_data = []
+    for question in session_data["questions"]:
+        options = question["options"]
+        correct_answer = question["correct_answer"]
+        votes = question["votes"]
+        is_correct = [option == correct_answer for option in options]
+
+        # The vote columns are the question's answer log: each row becomes one
+        # player's answer, so finalizing is a single pass over the votes cast
+        player_answers = [
+            PlayerAnswer(
+                nickname=slots[slot],
+                answer=options[option_index],
+                time_taken=time_taken,
+                correct=is_correct[option_index],
+                points_earned=points
+            )
+            for slot, option_index, time_taken, points in zip(
+                votes["player_slots"], votes["options"], votes["time_taken"], votes["points"]
+            )
+        ]
+
+        questions_data.append(QuestionResult(
+            question_text=question["text"],
+            options=list(options),
+            correct_answer=correct_answer,
+            player_answers=player_answers,
+            total_votes=dict(zip(options, question["answers"]))
+        ))
+
+    # Create final leaderboard
+    final_leaderboard = {
+        player["nickname"]: player["score"] 
+        for player in session_data["players"].values()
+    }
+
+    # Calculate start and end times
+    start_time = datetime.fromtimestamp(session_data.get("quiz_start_time", time.time()))
+    end_time = end_time or datetime.now()
+
+    # Create quiz history record
+    quiz_history = QuizHistory(
+        quiz_name=quiz_name,
+        session_code=session_code,
+        start_time=start_time,
+        end_time=end_time,
+        questions=questions_data,
+        final_leaderboard=final_leaderboard,
+        total_players=len(session_data["players"])
+    )
+    return quiz_history
+
+
 class QuizHistoryStorage:
     """Handles storing completed quiz data to MongoDB."""
     
@@ -42,56 +100,7 @@ class QuizHistoryStorage:
     
     async def save_completed_quiz(self, session_code: str, quiz_name: str, session_data: dict) -> str:
         """Saves a completed quiz to the database."""
-        await asyncio.sleep(0)  # Simulate async I/O
-        
-        # Extract data from session
-        questions_data = []
-        for i, question in enumerate(session_data["questions"]):
-            # Get player answers for this question
-            player_answers = []
-            for player_id, player in session_data["players"].items():
-                # Check if player voted on this question
-                if player.get("voted_question") == i:
-                    vote_data = player.get("votes", {}).get(i, {})
-                    
-                    player_answers.append(PlayerAnswer(
-                        nickname=player["nickname"],
-                        answer=vote_data.get("answer", "Unknown"),
-                        time_taken=vote_data.get("time_taken", 0.0),
-                        correct=vote_data.get("answer") == question["correct_answer"],
-                        points_earned=vote_data.get("points_earned", 0)
-                    ))
-            
-            questions_data.append(QuestionResult(
-                question_text=question["text"],
-                options=question["options"],
-                correct_answer=question["correct_answer"],
-                player_answers=player_answers,
-                total_votes=question["answers"]
-            ))
-        
-        # Create final leaderboard
-        final_leaderboard = {
-            player["nickname"]: player["score"] 
-            for player in session_data["players"].values()
-        }
-        
-        # Calculate start and end times
-        start_time = datetime.fromtimestamp(session_data.get("quiz_start_time", time.time()))
-        end_time = datetime.now()
-        
-        # Create quiz history record
-        quiz_history = QuizHistory(
-            quiz_name=quiz_name,
-            session_code=session_code,
-            start_time=start_time,
-            end_time=end_time,
-            questions=questions_data,
-            final_leaderboard=final_leaderboard,
-            total_players=len(session_data["players"])
-        )
-        
-        # Save to MongoDB
+        quiz_history = build_quiz_history(session_code, quiz_name, session_data)
         result = await self.collection.insert_one(quiz_history)
         print(f"Saved completed quiz '{quiz_name}' to database with ID: {result.inserted_id}")
         return str(result.inserted_id)
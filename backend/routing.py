@@ -1,30 +1,42 @@
 # routing.py
+import os
 import uuid
-import pandas as pd
+import json
+import asyncio
 import io
-from typing import List
+from typing import List, Optional
 
 from fastapi import (APIRouter, Form, Request, WebSocket,
-                     WebSocketDisconnect, UploadFile, File, HTTPException)
+                     WebSocketDisconnect, UploadFile, File, HTTPException, Query)
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from storage import QuizSession, storage
-from utils import generate_session_code
+from storage import QuizSession, new_question_votes, storage
+from player_store import PlayerStore
+from utils import session_codes
 from connection import manager
-from event_handler import process_event, handle_disconnect, broadcast_state
+from event_handler import (process_event, handle_disconnect, request_broadcast,
+                           send_snapshot, broadcast_coalescer, session_actors, session_sweeper)
 from question_bank import (
     add_question_to_bank,
     get_all_questions,
+    get_questions_by_hash,
+    get_questions_page,
+    stream_questions,
     delete_question_from_bank,
     search_questions_by_tags,
     get_all_tags
 )
+from question_import import file_progress, import_questions, read_question_chunks
 from quiz_history import quiz_history_storage
+from history_writer import history_writer
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+# Rows per chunk when importing uploaded question files
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))
+
 
 # --- HTTP Endpoints ---
 
@@ -57,6 +69,12 @@ async def api_get_history():
     return quizzes
 
 
+@router.get("/api/history/stats")
+async def api_history_stats():
+    """API endpoint exposing the background history writer's queue, retries and spilled documents."""
+    return history_writer.get_stats()
+
+
 @router.post("/api/create_quiz")
 async def api_create_quiz(request: Request):
     """API endpoint to create a new quiz session."""
@@ -72,22 +90,22 @@ async def api_create_quiz(request: Request):
     # --- Check for questions from the bank ---
     selected_question_ids = form_data.getlist("question_bank_ids")
     
-    # Fetch all questions from the bank once
-    all_bank_questions = await get_all_questions()
-    bank_questions_map = {q["hash"]: q for q in all_bank_questions}
+    # Fetch only the selected questions, in the order they were selected
+    bank_questions, missing_question_ids = await get_questions_by_hash(selected_question_ids)
+    if missing_question_ids:
+        print(f"Selected questions not found in the bank: {', '.join(missing_question_ids)}")
 
     quiz_questions = []
 
     # Add selected questions from the bank
-    for q_hash in selected_question_ids:
-        if q_hash in bank_questions_map:
-            question = bank_questions_map[q_hash]
-            quiz_questions.append({
-                "text": question["text"],
-                "options": question["options"],
-                "answers": {opt: 0 for opt in question["options"]},
-                "correct_answer": question["correct_answer"]
-            })
+    for question in bank_questions:
+        quiz_questions.append({
+            "text": question["text"],
+            "options": question["options"],
+            "answers": [0] * len(question["options"]),
+            "votes": new_question_votes(),
+            "correct_answer": question["correct_answer"]
+        })
 
     # --- Process manually added questions ---
     manual_questions = form_data.getlist("questions")
@@ -117,7 +135,8 @@ async def api_create_quiz(request: Request):
             question_data = {
                 "text": q_text,
                 "options": opts,
-                "answers": {opt: 0 for opt in opts},
+                "answers": [0] * len(opts),
+                "votes": new_question_votes(),
                 "correct_answer": correct_answer,
                 "tags": question_tags
             }
@@ -128,26 +147,32 @@ async def api_create_quiz(request: Request):
         # Redirect back to create page with an error message, or just back
         return RedirectResponse(url="/create", status_code=303)
         
-    session_code = generate_session_code()
-    while await storage.session_exists(session_code):
-        session_code = generate_session_code()
-
     quiz_data: QuizSession = {
         "presenter": None,
         "state": "LOBBY",
         "current_question_index": -1,
         "questions": quiz_questions,
-        "players": {},
+        "players": PlayerStore(),
+        "slots": [],
+        "nicknames": {},
         "timer": timer_seconds,
         "question_start_time": 0.0,
         "quiz_name": quiz_name,
         "quiz_start_time": None
     }
-    await storage.save_session(session_code, quiz_data)
+    # The allocator never repeats a live code, but workers sharing storage each
+    # have their own; create_session reserves the code atomically and fails if
+    # another worker already took it, which normally never happens
+    session_code = session_codes.allocate()
+    while not await storage.create_session(session_code, quiz_data):
+        session_code = session_codes.allocate()
 
     accept_header = request.headers.get('accept', '')
     if 'application/json' in accept_header:
-        return JSONResponse(content={'session_code': session_code})
+        content = {'session_code': session_code}
+        if missing_question_ids:
+            content['missing_question_ids'] = missing_question_ids
+        return JSONResponse(content=content)
     return RedirectResponse(url=f"/presenter/{session_code}", status_code=303)
 
 
@@ -165,23 +190,66 @@ async def audience_view(request: Request, session_code: str):
     return templates.TemplateResponse("index.html", {"request": request, "session_code": session_code})
 
 
+@router.get("/api/sessions/stats")
+async def api_sessions_stats():
+    """API endpoint exposing session count, estimated memory use and evictions (as of the last sweep)."""
+    return {**session_sweeper.get_stats(), "codes": session_codes.get_stats()}
+
+
+@router.get("/api/sessions/{session_code}/stats")
+async def api_session_stats(session_code: str):
+    """API endpoint exposing runtime counters for a live session."""
+    if not await storage.session_exists(session_code):
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return {
+        "events": session_actors.get_stats(session_code),
+        "broadcasts": broadcast_coalescer.get_stats(session_code),
+        "connections": manager.get_stats(session_code)
+    }
+
+
 # --- Question Bank Endpoints ---
 
 @router.get("/question-bank", response_class=HTMLResponse)
 async def question_bank_page(request: Request):
-    questions = await get_all_questions()
+    # Questions are loaded page by page from /api/question-bank by the page itself
     tags = await get_all_tags()
-    return templates.TemplateResponse("question_bank.html", {"request": request, "questions": questions, "tags": tags})
+    return templates.TemplateResponse("question_bank.html", {"request": request, "tags": tags})
 
 @router.get("/api/question-bank")
-async def api_get_question_bank(tags: str = None):
-    """API endpoint to get all questions from the bank with optional tag filtering."""
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
-        questions = await search_questions_by_tags(tag_list)
-    else:
-        questions = await get_all_questions()
-    return questions
+async def api_get_question_bank(request: Request, tags: str = None, search: Optional[str] = None,
+                                limit: Optional[int] = None, cursor: Optional[str] = None,
+                                format: Optional[str] = None, all_questions: bool = Query(False, alias="all")):
+    """API endpoint to get questions from the bank with optional tag and text filtering.
+
+    `tags` (comma-separated) matches questions with any of the tags, `search`
+    questions whose text contains it; both are case-insensitive.
+
+    - By default one page as `{"questions": [...], "next_cursor": ...}`:
+      `limit` questions (50 unless given) after `cursor` from the previous page.
+    - `format=ndjson` (or `Accept: application/x-ndjson`): every match streamed
+      as one JSON document per line.
+    - `all=true`: all matches as one JSON array.
+    """
+    tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()] if tags else []
+    search = search.strip() if search else None
+
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def lines():
+            async for question in stream_questions(tag_list, search):
+                yield json.dumps(question) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    if all_questions:
+        if tag_list or search:
+            return await search_questions_by_tags(tag_list, search)
+        return await get_all_questions()
+
+    try:
+        questions, next_cursor = await get_questions_page(limit or 50, cursor, tag_list, search)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"questions": questions, "next_cursor": next_cursor}
 
 @router.get("/api/question-bank/tags")
 async def api_get_tags():
@@ -232,9 +300,13 @@ async def websocket_endpoint(websocket: WebSocket, session_code: str):
 
     player_id = str(uuid.uuid4())
     await manager.connect(websocket, session_code, player_id)
-    
-    # On first connect, broadcast initial state
-    await broadcast_state(session_code)
+
+    # Clients connecting with ?protocol=delta get a sequenced snapshot followed by diffs
+    if websocket.query_params.get("protocol") == "delta":
+        await send_snapshot(session_code, player_id)
+
+    # On first connect, broadcast initial state (coalesced with other joins)
+    await request_broadcast(session_code)
 
     try:
         while True:
@@ -279,8 +351,13 @@ async def download_template():
     )
 
 @router.post("/api/upload-questions")
-async def upload_questions(file: UploadFile = File(...)):
-    """Upload questions from CSV or Excel file."""
+async def upload_questions(file: UploadFile = File(...), progress: Optional[str] = None):
+    """Upload questions from CSV or Excel file.
+
+    Rows are imported in chunks (see question_import.py). With
+    `?progress=ndjson` a progress report is streamed after every chunk, the
+    last line being the final result.
+    """
     
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded")
@@ -291,86 +368,34 @@ async def upload_questions(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
     
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Parse based on file type
-        if file_extension == 'csv':
-            df = pd.read_csv(io.BytesIO(content))
-        else:  # Excel file
-            df = pd.read_excel(io.BytesIO(content))
-        
-        # Validate required columns
-        required_columns = ['Question', 'Option1', 'Option2', 'Option3', 'Option4', 'CorrectAnswer']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
-            )
-        
-        # Process questions
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
+        # The upload is already spooled to a temporary file; read it from there chunk by chunk
+        chunks = await asyncio.to_thread(read_question_chunks, file.file, file_extension, UPLOAD_CHUNK_ROWS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    # Only CSV is read front to back, so only there does the file position measure progress
+    reports = import_questions(chunks, file_progress(file.file) if file_extension == 'csv' else lambda: None)
+
+    def upload_result(report):
+        message = (f"Upload completed. {report['success_count']} questions added successfully, "
+                   f"{report['error_count']} errors.")
+        if report['error_count'] > len(report['errors']):
+            message += f" Showing the first {len(report['errors'])} errors."
+        return {"success": True, "message": message, **report}
+
+    if progress == "ndjson":
+        async def lines():
             try:
-                # Extract data
-                question_text = str(row['Question']).strip()
-                options = [
-                    str(row['Option1']).strip(),
-                    str(row['Option2']).strip(),
-                    str(row['Option3']).strip(),
-                    str(row['Option4']).strip()
-                ]
-                correct_answer = str(row['CorrectAnswer']).strip()
-                tags = str(row.get('Tags', '')).strip()
-                
-                # Validate data
-                if not question_text or question_text == 'nan':
-                    continue
-                
-                if not all(options) or any(opt == 'nan' for opt in options):
-                    errors.append(f"Row {index + 1}: Invalid options")
-                    error_count += 1
-                    continue
-                
-                if not correct_answer or correct_answer == 'nan':
-                    errors.append(f"Row {index + 1}: Missing correct answer")
-                    error_count += 1
-                    continue
-                
-                if correct_answer not in options:
-                    errors.append(f"Row {index + 1}: Correct answer must be one of the options")
-                    error_count += 1
-                    continue
-                
-                # Parse tags
-                tag_list = []
-                if tags and tags != 'nan':
-                    tag_list = [tag.strip().lower() for tag in tags.split(',') if tag.strip()]
-                
-                # Add to question bank
-                result = await add_question_to_bank(question_text, options, correct_answer, tag_list)
-                
-                if "error" not in result:
-                    success_count += 1
-                else:
-                    errors.append(f"Row {index + 1}: {result['error']}")
-                    error_count += 1
-                    
+                async for report in reports:
+                    yield json.dumps(upload_result(report) if report["done"] else report) + "\n"
             except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-                error_count += 1
-        
-        return {
-            "success": True,
-            "message": f"Upload completed. {success_count} questions added successfully, {error_count} errors.",
-            "success_count": success_count,
-            "error_count": error_count,
-            "errors": errors
-        }
-        
+                yield json.dumps({"done": True, "success": False, "detail": f"Error processing file: {str(e)}"}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    try:
+        async for report in reports:
+            pass
+        return upload_result(report)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,71 @@
+# session_actor.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypedDict
+
+# An inbound item for a session: (kind, player_id, payload), e.g.
+# ("event", player_id, {"type": "vote", ...}), ("disconnect", player_id, None)
+# or ("timer", None, question_index).
+SessionItem = Tuple[str, Any, Any]
+
+
+class ActorStats(TypedDict):
+    events: int   # Items applied
+    batches: int  # Load/save/broadcast cycles used to apply them
+
+
+class SessionActors:
+    """Runs one single-writer actor per session.
+
+    Every change to a session goes through its inbound queue and is applied by
+    one task, in order, so concurrent votes, joins and timer expiries can no
+    longer interleave between a read and a write. Items that queue up while a
+    batch is being applied are drained together and share one save and one
+    broadcast.
+    """
+
+    def __init__(self, apply_batch: Callable[[str, List[SessionItem]], Awaitable[None]], max_batch: int = 500):
+        self._apply_batch = apply_batch
+        self.max_batch = max_batch
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, ActorStats] = {}
+
+    async def submit(self, session_code: str, item: SessionItem):
+        """Queues an item for the session and waits until it has been applied."""
+        done = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(session_code)
+        if queue is None:
+            queue = self._queues[session_code] = asyncio.Queue()
+            self._tasks[session_code] = asyncio.create_task(self._run(session_code, queue))
+        queue.put_nowait((item, done))
+        await done
+
+    async def _run(self, session_code: str, queue: asyncio.Queue):
+        stats = self._stats.setdefault(session_code, {"events": 0, "batches": 0})
+        while not queue.empty():
+            entries = [queue.get_nowait()]
+            while not queue.empty() and len(entries) < self.max_batch:
+                entries.append(queue.get_nowait())
+
+            try:
+                await self._apply_batch(session_code, [item for item, _ in entries])
+            except Exception as e:
+                print(f"Error applying events for {session_code}: {e}")
+            finally:
+                stats["events"] += len(entries)
+                stats["batches"] += 1
+                for _, done in entries:
+                    if not done.done():
+                        done.set_result(None)
+
+        # Idle: retire the actor; the next submit starts a fresh one
+        del self._queues[session_code]
+        del self._tasks[session_code]
+
+    def get_stats(self, session_code: str) -> ActorStats:
+        """Returns how many items were applied and in how many batches."""
+        return dict(self._stats.get(session_code, {"events": 0, "batches": 0}))
+
+    def discard(self, session_code: str):
+        self._stats.pop(session_code, None)
@@ -0,0 +1,104 @@
+# session_lifecycle.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, TypedDict
+
+from storage import QuizStorage
+
+# --- Session Lifecycle ---
+# Sessions are not kept forever. A background sweeper removes:
+#   * sessions idle for longer than the TTL of their state (an abandoned
+#     LOBBY, a FINISHED quiz nobody is looking at any more), and
+#   * when the estimated memory of all sessions exceeds the budget, the least
+#     recently used sessions that have no connected clients.
+# Evicted sessions are deleted from storage and `on_evict` lets the rest of
+# the application drop its per-session state (leaderboards, queues, sockets).
+
+
+class SweeperStats(TypedDict):
+    sessions: int
+    memory_bytes: int
+    memory_budget: int         # 0 = no budget
+    evicted_ttl: int
+    evicted_memory: int
+    sweeps: int
+
+
+class SessionSweeper:
+    """Periodically evicts expired sessions and keeps memory within a budget."""
+
+    def __init__(self, storage: QuizStorage, ttls: Dict[str, float], memory_budget: int,
+                 is_active: Callable[[str], bool], on_evict: Callable[[str], Awaitable[None]],
+                 interval: float = 30.0):
+        self.storage = storage
+        self.ttls = ttls                  # state -> seconds of inactivity before eviction
+        self.memory_budget = memory_budget
+        self.is_active = is_active        # Whether a session still has connected clients
+        self.on_evict = on_evict
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stats: SweeperStats = {
+            "sessions": 0, "memory_bytes": 0, "memory_budget": 0,
+            "evicted_ttl": 0, "evicted_memory": 0, "sweeps": 0,
+        }
+        print(f"Initialized SessionSweeper (every {interval:.0f}s, budget {memory_budget // 1_000_000} MB).")
+
+    async def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error sweeping sessions: {e}")
+
+    async def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Runs one sweep and returns the codes of the evicted sessions."""
+        now = time.time() if now is None else now
+        usage = await self.storage.list_session_usage()
+        evicted = []
+
+        remaining = []
+        for entry in usage:
+            ttl = self.ttls.get(entry["state"])
+            if ttl is not None and now - entry["last_active"] > ttl:
+                evicted.append(entry["session_code"])
+                self._stats["evicted_ttl"] += 1
+            else:
+                remaining.append(entry)
+
+        memory = sum(entry["bytes"] or 0 for entry in remaining)
+        if self.memory_budget and memory > self.memory_budget:
+            # `usage` is least recently used first
+            for entry in remaining:
+                if memory <= self.memory_budget:
+                    break
+                if entry["bytes"] is None or self.is_active(entry["session_code"]):
+                    continue
+                evicted.append(entry["session_code"])
+                memory -= entry["bytes"]
+                self._stats["evicted_memory"] += 1
+
+        for session_code in evicted:
+            await self.storage.delete_session(session_code)
+            await self.on_evict(session_code)
+        if evicted:
+            print(f"Evicted {len(evicted)} sessions: {', '.join(evicted)}")
+
+        self._stats["sessions"] = len(usage) - len(evicted)
+        self._stats["memory_bytes"] = memory
+        self._stats["sweeps"] += 1
+        return evicted
+
+    def get_stats(self) -> SweeperStats:
+        """Returns session count and memory as of the last sweep, plus eviction counts."""
+        return {**self._stats, "memory_budget": self.memory_budget}
@@ -0,0 +1,180 @@
+# sharding.py
+
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import sys
+import tempfile
+import zlib
+from typing import List, Optional
+
+# --- Session Sharding ---
+# One uvicorn process runs every quiz on a single event loop, so one core caps
+# the throughput of all sessions together. In sharded mode this script starts
+# one worker process ("shard") per core and a small front process that owns
+# the public port:
+#
+#   * Each session lives on exactly one shard, chosen by hashing its code.
+#     Shards allocate only codes that hash to themselves, so a quiz created on
+#     any shard is served by that same shard afterwards.
+#   * The front reads just the request line of each incoming connection,
+#     picks the shard (by session code for /ws, /presenter, /join and
+#     /api/sessions/{code}/..., round-robin for everything else) and then
+#     pipes bytes between the client and the shard's unix socket untouched.
+#     WebSocket traffic is never parsed by the front.
+#
+# Plain HTTP requests are forwarded with `Connection: close`, so every request
+# is routed on its own; WebSockets stay on their shard for their lifetime.
+#
+#   cd backend && python sharding.py --shards 4 --port 8000
+
+_SESSION_PATH = re.compile(r"^/(?:ws|presenter|join)/([^/?]+)|^/api/sessions/([^/?]+)/")
+_CHUNK_SIZE = 64 * 1024
+
+
+def shard_for(session_code: str, shard_count: int) -> int:
+    """Returns the shard owning a session; stable across processes (unlike hash())."""
+    return zlib.crc32(session_code.encode()) % shard_count
+
+
+def session_code_from_path(path: str) -> Optional[str]:
+    match = _SESSION_PATH.match(path)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Copies bytes until EOF, then half-closes the other side."""
+    try:
+        while True:
+            data = await reader.read(_CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+def _rewrite_head(head: bytes) -> bytes:
+    """Forces `Connection: close` on plain HTTP requests; upgrades are left as they are."""
+    lines = head[:-4].split(b"\r\n")
+    names = [line.partition(b":")[0].strip().lower() for line in lines[1:]]
+    if b"upgrade" in names:
+        return head
+    headers = [line for name, line in zip(names, lines[1:]) if name != b"connection"]
+    return b"\r\n".join([lines[0], *headers, b"Connection: close"]) + b"\r\n\r\n"
+
+
+class ShardRouter:
+    """Front process: routes each client connection to the shard owning its session."""
+
+    def __init__(self, socket_paths: List[str]):
+        self.socket_paths = socket_paths
+        self._round_robin = itertools.cycle(range(len(socket_paths)))
+
+    def route(self, path: str) -> int:
+        session_code = session_code_from_path(path)
+        if session_code is None:
+            return next(self._round_robin)
+        return shard_for(session_code, len(self.socket_paths))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            target = head.split(b"\r\n", 1)[0].split(b" ")[1].decode("latin-1")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError, ConnectionError):
+            writer.close()
+            return
+
+        shard = self.route(target.split("?", 1)[0])
+        try:
+            shard_reader, shard_writer = await asyncio.open_unix_connection(self.socket_paths[shard])
+        except OSError as e:
+            print(f"Shard {shard} unavailable: {e}")
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+
+        shard_writer.write(_rewrite_head(head))
+        to_shard = asyncio.create_task(_pipe(reader, shard_writer))
+        try:
+            # The connection ends when the shard closes its side
+            await _pipe(shard_reader, writer)
+        finally:
+            to_shard.cancel()
+            writer.close()
+            shard_writer.close()
+
+
+async def _start_shard(index: int, count: int, socket_path: str, uvicorn_args: List[str]):
+    env = {**os.environ, "SHARD_INDEX": str(index), "SHARD_COUNT": str(count)}
+    # Every shard keeps its own journal (sessions are only ever replayed by
+    # their owner) and its own history spill files
+    if env.get("SESSION_JOURNAL_DIR"):
+        env["SESSION_JOURNAL_DIR"] = os.path.join(env["SESSION_JOURNAL_DIR"], f"shard-{index}")
+    env["HISTORY_SPILL_DIR"] = os.path.join(env.get("HISTORY_SPILL_DIR", "history_spill"), f"shard-{index}")
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "main:app", "--uds", socket_path, *uvicorn_args,
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+
+
+async def _wait_for_socket(path: str, process, timeout: float = 60.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if process.returncode is not None:
+            raise RuntimeError(f"Shard exited during startup (code {process.returncode})")
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Shard socket {path} not ready after {timeout:.0f}s")
+
+
+async def serve(shards: int, host: str, port: int, uvicorn_args: List[str]):
+    socket_dir = tempfile.mkdtemp(prefix="quiz-shards-")
+    socket_paths = [os.path.join(socket_dir, f"shard-{i}.sock") for i in range(shards)]
+    processes = [await _start_shard(i, shards, path, uvicorn_args) for i, path in enumerate(socket_paths)]
+    try:
+        for path, process in zip(socket_paths, processes):
+            await _wait_for_socket(path, process)
+        router = ShardRouter(socket_paths)
+        server = await asyncio.start_server(router.handle, host, port)
+        print(f"Routing http://{host}:{port} to {shards} shards.")
+        async with server:
+            await server.serve_forever()
+    finally:
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        for process in processes:
+            await process.wait()
+        for path in socket_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(socket_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the quiz app as one process per core, sharded by session")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args, uvicorn_args = parser.parse_known_args()
+    try:
+        asyncio.run(serve(args.shards, args.host, args.port, uvicorn_args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
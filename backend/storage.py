@@ -1,43 +1,110 @@
 # storage.py
 
 import asyncio
-from typing import Dict, List, Literal, Optional, Protocol, TypedDict
+import json
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Literal, MutableMapping, Optional, Protocol, TypedDict
+
+from journal import SessionJournal, decode_session, encode_session
+from player_store import PlayerStore
 
 # --- Data Structures ---
 # Using TypedDicts for structured data makes the code more readable,
 # self-documenting, and allows static analysis tools to catch bugs.
 
-class PlayerVote(TypedDict):
-    answer: str
-    time_taken: float  # seconds from question start
-    points_earned: int
+class QuestionVotes(TypedDict):
+    # Append-only answer log of a question, written as votes arrive: row i of
+    # each array is one vote, in arrival order. Rows are never rewritten, so
+    # every player's answer to every question is kept for the quiz history.
+    # Typed arrays keep a vote at a few bytes instead of a dict per vote.
+    player_slots: array  # 'I': slot of the voting player (see QuizSession.slots)
+    options: array       # 'B': index of the chosen option
+    time_taken: array    # 'f': seconds from question start
+    points: array        # 'I': points earned
 
 class Player(TypedDict):
     nickname: str
     score: int
     voted_question: int # The index of the last question the player voted on
-    votes: Dict[int, PlayerVote]  # Maps question index to vote details
+    slot: int  # Small, stable id of the player within the session
     online: bool  # Whether the player is currently connected
 
 class Question(TypedDict):
     text: str
     options: List[str]
-    answers: Dict[str, int] # Maps option text to vote count
+    answers: List[int] # Vote count per option index
+    votes: QuestionVotes
     correct_answer: str
     tags: List[str]  # List of tags/subjects for categorization
 
 QuizState = Literal["LOBBY", "QUESTION", "RESULTS", "FINISHED"]
 
+class QuestionTimer(TypedDict):
+    # Timer of the running question, kept with the session so a restart (or
+    # another worker) resumes it as it was. Deadlines and remaining time are
+    # derived from it and question_start_time; see event_handler.
+    question_index: int
+    limit: float                # Seconds the question runs for, extensions included
+    paused_total: float         # Seconds spent paused in completed pauses
+    paused_at: Optional[float]  # Timestamp the current pause began; None while running
+
 class QuizSession(TypedDict):
     presenter: Optional[str] # player_id of the presenter
     state: QuizState
     current_question_index: int
     questions: List[Question]
-    players: Dict[str, Player] # Maps player_id to Player object
+    players: MutableMapping[str, Player] # Maps player_id to Player object (a compact PlayerStore in live sessions)
+    slots: List[str] # Nickname for each player slot; slots survive reconnects
+    nicknames: Dict[str, str] # Maps nickname to the player_id currently holding it
     timer: int # Time limit in seconds for each question
     question_start_time: float # Timestamp when the current question was started
     quiz_name: str  # Name of the quiz
     quiz_start_time: Optional[float]  # Timestamp when quiz was started
+    question_timer: Optional[QuestionTimer]  # Timer of the current question, if one was started
+
+class QuestionView(TypedDict):
+    text: str
+    options: List[str]
+    answers: List[int]  # A copy of the vote counts at the time of the read
+    correct_answer: str
+
+class PublicView(TypedDict):
+    # Everything about a session except its players and votes; cheap to read
+    presenter: Optional[str]
+    state: QuizState
+    current_question_index: int
+    total_questions: int
+    question: Optional[QuestionView]  # The current question, if one is running
+    timer: int
+    question_start_time: Optional[float]
+    quiz_name: str
+    quiz_start_time: Optional[float]
+    question_timer: Optional[QuestionTimer]
+    nicknames: Dict[str, str]  # player_id -> nickname for the players asked for
+
+class PlayerUpsert(TypedDict):
+    status: Literal["joined", "reconnected", "taken"]
+    replaced_id: Optional[str]  # The offline (or, if taken, online) id previously holding the nickname
+    score: int
+
+class SessionUsage(TypedDict):
+    session_code: str
+    state: QuizState
+    last_active: float  # Timestamp of the last read or write
+    bytes: Optional[int]  # Estimated memory use; None if the backend manages its own memory
+
+def new_question_votes() -> QuestionVotes:
+    """Creates the empty vote columns for a question."""
+    return {
+        "player_slots": array("I"),
+        "options": array("B"),
+        "time_taken": array("f"),
+        "points": array("I"),
+    }
 
 # --- The Storage Abstraction (Interface) ---
 # We use a Protocol to define the methods our storage classes must have.
@@ -60,6 +127,115 @@ class QuizStorage(Protocol):
         """Checks if a session exists."""
         ...
 
+    async def create_session(self, session_code: str, data: QuizSession) -> bool:
+        """Saves a new session; returns False without saving if the code is already taken."""
+        ...
+
+    # Fine-grained operations: the cost of each depends on the size of the
+    # change, not on the number of players or votes in the session.
+
+    async def get_public_view(self, session_code: str, player_ids: Iterable[str] = ()) -> Optional[PublicView]:
+        """Reads the session without its players and votes, plus the nicknames of `player_ids`."""
+        ...
+
+    async def upsert_player(self, session_code: str, player_id: str, nickname: str,
+                            presenter: bool = False) -> Optional[PlayerUpsert]:
+        """Adds a player, or moves an offline player with the same nickname to `player_id`.
+
+        The first player of a session, or one joining with `presenter=True`,
+        becomes the presenter. Nothing changes if the nickname is online.
+        """
+        ...
+
+    async def set_player_online(self, session_code: str, player_id: str, online: bool) -> Optional[str]:
+        """Marks a player on- or offline and returns their nickname (None if unknown)."""
+        ...
+
+    async def record_vote(self, session_code: str, player_id: str, question_index: int, option_index: int,
+                          time_taken: float, points: int) -> Optional[int]:
+        """Records a player's vote and returns their new score.
+
+        Returns None (and records nothing) if the player is unknown, already
+        voted on the question, or the question or option does not exist.
+        """
+        ...
+
+    async def transition_state(self, session_code: str, state: QuizState, question_index: Optional[int] = None,
+                               from_state: Optional[QuizState] = None, from_index: Optional[int] = None,
+                               question_start_time: Optional[float] = None,
+                               quiz_start_time: Optional[float] = None) -> bool:
+        """Moves the session to `state` (and `question_index`), optionally only from a given position.
+
+        Returns False without changing anything if the session is not at
+        `from_state` / `from_index`.
+        """
+        ...
+
+    async def set_question_timer(self, session_code: str, timer: QuestionTimer) -> bool:
+        """Stores the timer of the running question.
+
+        Returns False without changing anything unless the session is in
+        QUESTION at `timer["question_index"]`.
+        """
+        ...
+
+    # Lifecycle: used by the session sweeper (session_lifecycle.py)
+
+    async def delete_session(self, session_code: str) -> None:
+        """Removes a session and everything stored for it."""
+        ...
+
+    async def list_session_usage(self) -> List[SessionUsage]:
+        """Lists every session with its state, last activity and size, least recently used first."""
+        ...
+
+    async def recover(self) -> List[str]:
+        """Restores persisted sessions after a restart and returns the codes of all sessions."""
+        ...
+
+
+# Estimated bytes per session part, from benchmarks/player_memory.py plus the
+# player_id, nickname index and slot entries that sit next to a player's columns
+_SESSION_BYTES = 4096
+_QUESTION_BYTES = 1024
+_PLAYER_BYTES = 400
+_VOTE_BYTES = 13
+
+
+def _estimate_session_bytes(session: QuizSession) -> int:
+    """Approximates a session's memory use without walking its players or votes."""
+    votes = sum(len(question["votes"]["options"]) for question in session["questions"])
+    return (_SESSION_BYTES + _QUESTION_BYTES * len(session["questions"])
+            + _PLAYER_BYTES * len(session["slots"]) + _VOTE_BYTES * votes)
+
+
+def _public_view(session: QuizSession, player_ids: Iterable[str]) -> PublicView:
+    """Builds the PublicView of an in-memory session."""
+    index = session["current_question_index"]
+    question = None
+    if 0 <= index < len(session["questions"]):
+        current = session["questions"][index]
+        question = {
+            "text": current["text"],
+            "options": current["options"],
+            "answers": list(current["answers"]),
+            "correct_answer": current["correct_answer"],
+        }
+    players = session["players"]
+    return {
+        "presenter": session.get("presenter"),
+        "state": session["state"],
+        "current_question_index": index,
+        "total_questions": len(session["questions"]),
+        "question": question,
+        "timer": session.get("timer", 30),
+        "question_start_time": session.get("question_start_time"),
+        "quiz_name": session.get("quiz_name"),
+        "quiz_start_time": session.get("quiz_start_time"),
+        "question_timer": session.get("question_timer"),
+        "nicknames": {pid: players[pid]["nickname"] for pid in player_ids if pid in players},
+    }
+
 # --- In-Memory Storage Implementation ---
 # This is our first implementation of the QuizStorage interface.
 # It uses a simple Python dictionary to store data. It's fast and
@@ -70,26 +246,740 @@ class MemoryStorage:
 
     def __init__(self):
         self._sessions: Dict[str, QuizSession] = {}
+        # Last access time per session, least recently used first
+        self._last_active: "OrderedDict[str, float]" = OrderedDict()
         print("Initialized MemoryStorage.")
 
+    def _access(self, session_code: str) -> Optional[QuizSession]:
+        """Returns a session and marks it as most recently used."""
+        session = self._sessions.get(session_code)
+        if session is not None:
+            self._last_active[session_code] = time.time()
+            self._last_active.move_to_end(session_code)
+        return session
+
     async def get_session(self, session_code: str) -> Optional[QuizSession]:
         # We use a short asyncio.sleep(0) to simulate a non-blocking I/O call,
         # which is good practice when adhering to an async interface.
         await asyncio.sleep(0)
-        return self._sessions.get(session_code)
+        return self._access(session_code)
 
     async def save_session(self, session_code: str, data: QuizSession) -> None:
         await asyncio.sleep(0)
         self._sessions[session_code] = data
+        self._access(session_code)
 
     async def session_exists(self, session_code: str) -> bool:
         await asyncio.sleep(0)
         return session_code in self._sessions
 
+    async def create_session(self, session_code: str, data: QuizSession) -> bool:
+        if session_code in self._sessions:
+            return False
+        # Goes through save_session so JournaledStorage logs it
+        await self.save_session(session_code, data)
+        return True
+
+    async def get_public_view(self, session_code: str, player_ids: Iterable[str] = ()) -> Optional[PublicView]:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        return _public_view(session, player_ids) if session else None
+
+    async def upsert_player(self, session_code: str, player_id: str, nickname: str,
+                            presenter: bool = False) -> Optional[PlayerUpsert]:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        if not session:
+            return None
+        players = session["players"]
+
+        existing_id = session["nicknames"].get(nickname)
+        existing = players.get(existing_id) if existing_id else None
+        if existing is not None:
+            if existing["online"]:
+                return {"status": "taken", "replaced_id": existing_id, "score": existing["score"]}
+            # Reconnection: the player keeps their slot, score and votes
+            players[player_id] = existing
+            players[player_id]["online"] = True
+            del players[existing_id]
+            session["nicknames"][nickname] = player_id
+            if session.get("presenter") == existing_id:
+                session["presenter"] = player_id
+            return {"status": "reconnected", "replaced_id": existing_id, "score": players[player_id]["score"]}
+
+        if presenter or session.get("presenter") is None:
+            session["presenter"] = player_id
+        players[player_id] = {
+            "nickname": nickname,
+            "score": 0,
+            "voted_question": -1,
+            "slot": len(session["slots"]),
+            "online": True
+        }
+        session["slots"].append(nickname)
+        session["nicknames"][nickname] = player_id
+        return {"status": "joined", "replaced_id": None, "score": 0}
+
+    async def set_player_online(self, session_code: str, player_id: str, online: bool) -> Optional[str]:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        if not session or player_id not in session["players"]:
+            return None
+        player = session["players"][player_id]
+        player["online"] = online
+        return player["nickname"]
+
+    async def record_vote(self, session_code: str, player_id: str, question_index: int, option_index: int,
+                          time_taken: float, points: int) -> Optional[int]:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        if not session or player_id not in session["players"]:
+            return None
+        player = session["players"][player_id]
+        if player["voted_question"] == question_index or not 0 <= question_index < len(session["questions"]):
+            return None
+        question = session["questions"][question_index]
+        if not 0 <= option_index < len(question["options"]):
+            return None
+
+        question["answers"][option_index] += 1
+        player["voted_question"] = question_index
+        player["score"] += points
+        votes = question["votes"]
+        votes["player_slots"].append(player["slot"])
+        votes["options"].append(option_index)
+        votes["time_taken"].append(time_taken)
+        votes["points"].append(points)
+        return player["score"]
+
+    async def transition_state(self, session_code: str, state: QuizState, question_index: Optional[int] = None,
+                               from_state: Optional[QuizState] = None, from_index: Optional[int] = None,
+                               question_start_time: Optional[float] = None,
+                               quiz_start_time: Optional[float] = None) -> bool:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        if not session:
+            return False
+        if from_state is not None and session["state"] != from_state:
+            return False
+        if from_index is not None and session["current_question_index"] != from_index:
+            return False
+
+        session["state"] = state
+        if question_index is not None:
+            session["current_question_index"] = question_index
+        if question_start_time is not None:
+            session["question_start_time"] = question_start_time
+        if quiz_start_time is not None:
+            session["quiz_start_time"] = quiz_start_time
+        return True
+
+    async def set_question_timer(self, session_code: str, timer: QuestionTimer) -> bool:
+        await asyncio.sleep(0)
+        session = self._access(session_code)
+        if not session or session["state"] != "QUESTION":
+            return False
+        if session["current_question_index"] != timer["question_index"]:
+            return False
+        session["question_timer"] = dict(timer)
+        return True
+
+    async def delete_session(self, session_code: str) -> None:
+        await asyncio.sleep(0)
+        self._sessions.pop(session_code, None)
+        self._last_active.pop(session_code, None)
+
+    async def list_session_usage(self) -> List[SessionUsage]:
+        await asyncio.sleep(0)
+        return [
+            {
+                "session_code": session_code,
+                "state": self._sessions[session_code]["state"],
+                "last_active": last_active,
+                "bytes": _estimate_session_bytes(self._sessions[session_code]),
+            }
+            for session_code, last_active in self._last_active.items()
+        ]
+
+    async def recover(self) -> List[str]:
+        # Nothing survives a restart
+        return []
+
+# --- Journaled In-Memory Storage ---
+# MemoryStorage plus a SessionJournal (see journal.py): every change is logged
+# with the exact arguments it was applied with (timestamps, points), so
+# replaying the log through MemoryStorage rebuilds the same sessions.
+
+class JournaledStorage(MemoryStorage):
+    """MemoryStorage whose sessions survive a restart via snapshots and an event log."""
+
+    def __init__(self, directory: str, snapshot_every: int = 50_000):
+        super().__init__()
+        self._journal = SessionJournal(directory, snapshot_every)
+        self._snapshot_task: Optional[asyncio.Task] = None
+        print(f"Journaling sessions to {directory}.")
+
+    def _log(self, *record):
+        self._journal.append(list(record))
+        if self._journal.needs_snapshot:
+            self._snapshot_task = asyncio.create_task(self._journal.snapshot(self._sessions))
+
+    async def save_session(self, session_code: str, data: QuizSession) -> None:
+        await super().save_session(session_code, data)
+        self._log("save", session_code, encode_session(data))
+
+    async def upsert_player(self, session_code: str, player_id: str, nickname: str,
+                            presenter: bool = False) -> Optional[PlayerUpsert]:
+        result = await super().upsert_player(session_code, player_id, nickname, presenter)
+        if result and result["status"] != "taken":
+            self._log("upsert_player", session_code, player_id, nickname, presenter)
+        return result
+
+    async def set_player_online(self, session_code: str, player_id: str, online: bool) -> Optional[str]:
+        nickname = await super().set_player_online(session_code, player_id, online)
+        if nickname is not None:
+            self._log("set_player_online", session_code, player_id, online)
+        return nickname
+
+    async def record_vote(self, session_code: str, player_id: str, question_index: int, option_index: int,
+                          time_taken: float, points: int) -> Optional[int]:
+        score = await super().record_vote(session_code, player_id, question_index, option_index, time_taken, points)
+        if score is not None:
+            self._log("record_vote", session_code, player_id, question_index, option_index, time_taken, points)
+        return score
+
+    async def transition_state(self, session_code: str, state: QuizState, question_index: Optional[int] = None,
+                               from_state: Optional[QuizState] = None, from_index: Optional[int] = None,
+                               question_start_time: Optional[float] = None,
+                               quiz_start_time: Optional[float] = None) -> bool:
+        changed = await super().transition_state(session_code, state, question_index, from_state, from_index,
+                                                 question_start_time, quiz_start_time)
+        if changed:
+            self._log("transition_state", session_code, state, question_index, None, None,
+                      question_start_time, quiz_start_time)
+        return changed
+
+    async def set_question_timer(self, session_code: str, timer: QuestionTimer) -> bool:
+        changed = await super().set_question_timer(session_code, timer)
+        if changed:
+            self._log("set_question_timer", session_code, timer)
+        return changed
+
+    async def delete_session(self, session_code: str) -> None:
+        await super().delete_session(session_code)
+        self._log("delete_session", session_code)
+
+    async def recover(self) -> List[str]:
+        snapshot, records = self._journal.load()
+        for session_code, data in snapshot.items():
+            await MemoryStorage.save_session(self, session_code, decode_session(data))
+        replayed = 0
+        for op, session_code, *args in records:
+            if op == "save":
+                await MemoryStorage.save_session(self, session_code, decode_session(args[0]))
+            else:
+                # Apply through MemoryStorage so replayed changes are not logged again
+                await getattr(MemoryStorage, op)(self, session_code, *args)
+            replayed += 1
+        # Start a fresh generation so the next recovery has no log to replay
+        await self._journal.snapshot(self._sessions)
+        print(f"Recovered {len(self._sessions)} sessions ({len(snapshot)} from snapshot, {replayed} log records).")
+        return list(self._sessions)
+
+# --- Redis Storage Implementation ---
+# Sessions are spread over several keys so a save only writes what changed:
+#
+#   quiz:{code}:meta          hash    scalar session fields (JSON values)
+#   quiz:{code}:questions     string  static question data (JSON), written once
+#   quiz:{code}:answers:{q}   hash    option index -> vote count (HINCRBY)
+#   quiz:{code}:votes:{q}     string  packed vote rows, grown with APPEND
+#   quiz:{code}:players       hash    slot -> player fields (JSON)
+#   quiz:{code}:player_ids    hash    player_id -> slot
+#   quiz:{code}:slots         list    nickname per slot (RPUSH)
+#   quiz:{code}:nicknames     hash    nickname -> player_id
+#
+# The store remembers what it last read or wrote for each session and turns
+# save_session into a diff against it: a vote becomes one HINCRBY, one APPEND
+# and one HSET of the voter, instead of rewriting the whole session. The
+# fine-grained operations write those keys directly and forget the remembered
+# state, so a later save_session rewrites the session in full.
+#
+# Several workers may change a session at once (BROADCAST_BUS=redis), so each
+# fine-grained operation reads and writes in one WATCH/MULTI transaction: if
+# another worker changes a key it read, it runs again on the new values.
+
+_META_FIELDS = ("presenter", "state", "current_question_index", "timer",
+                "question_start_time", "quiz_name", "quiz_start_time", "question_timer")
+_VOTE_ROW = struct.Struct("<IBfI")  # player slot, option index, time taken, points
+
+
+class _SavedState:
+    """What RedisStorage last read or wrote for one session."""
+
+    def __init__(self):
+        self.meta: Dict[str, str] = {}
+        self.num_questions = 0
+        self.answers: List[List[int]] = []
+        self.vote_counts: List[int] = []
+        self.players: Dict[int, str] = {}   # slot -> encoded player
+        self.player_ids: Dict[str, int] = {}
+        self.num_slots = 0
+        self.nicknames: Dict[str, str] = {}
+
+
+def _encode_player(player) -> str:
+    return json.dumps([player["nickname"], player["score"], player["voted_question"], bool(player["online"])])
+
+
+def _pack_votes(votes: QuestionVotes, start: int) -> bytes:
+    return b"".join(
+        _VOTE_ROW.pack(*row) for row in zip(
+            votes["player_slots"][start:], votes["options"][start:],
+            votes["time_taken"][start:], votes["points"][start:]
+        )
+    )
+
+
+def _unpack_votes(data: Optional[bytes]) -> QuestionVotes:
+    votes = new_question_votes()
+    for slot, option, time_taken, points in _VOTE_ROW.iter_unpack(data or b""):
+        votes["player_slots"].append(slot)
+        votes["options"].append(option)
+        votes["time_taken"].append(time_taken)
+        votes["points"].append(points)
+    return votes
+
+
+class RedisStorage:
+    """Redis implementation of the QuizStorage protocol with a field-level layout.
+
+    Pass `client` to use an existing redis.asyncio-compatible client (for
+    example `fakeredis.aioredis.FakeRedis()` in local testing).
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None):
+        if client is None:
+            # Imported lazily so the redis package is only needed when this backend is used
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+            print(f"Initialized RedisStorage at {url}.")
+        self._redis = client
+        self._saved: Dict[str, _SavedState] = {}
+        self._questions: Dict[str, list] = {}  # Static question data; never changes after creation
+
+    @staticmethod
+    def _key(session_code: str, *parts) -> str:
+        return ":".join(("quiz", session_code) + tuple(str(part) for part in parts))
+
+    async def get_session(self, session_code: str) -> Optional[QuizSession]:
+        key = self._key
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(key(session_code, "meta"))
+        pipe.get(key(session_code, "questions"))
+        pipe.hgetall(key(session_code, "players"))
+        pipe.hgetall(key(session_code, "player_ids"))
+        pipe.lrange(key(session_code, "slots"), 0, -1)
+        pipe.hgetall(key(session_code, "nicknames"))
+        meta_raw, questions_raw, players_raw, ids_raw, slots_raw, nicknames_raw = await pipe.execute()
+        if not meta_raw or questions_raw is None:
+            return None
+
+        static_questions = json.loads(questions_raw)
+        self._questions[session_code] = static_questions
+        pipe = self._redis.pipeline(transaction=True)
+        for q in range(len(static_questions)):
+            pipe.hgetall(key(session_code, "answers", q))
+            pipe.get(key(session_code, "votes", q))
+        per_question = await pipe.execute()
+
+        saved = _SavedState()
+        saved.meta = {field.decode(): value.decode() for field, value in meta_raw.items()}
+        saved.num_questions = len(static_questions)
+
+        questions: List[Question] = []
+        for q, static in enumerate(static_questions):
+            counts_raw, votes_raw = per_question[2 * q], per_question[2 * q + 1]
+            answers = [0] * len(static["options"])
+            for option, count in counts_raw.items():
+                answers[int(option)] = int(count)
+            votes = _unpack_votes(votes_raw)
+            saved.answers.append(list(answers))
+            saved.vote_counts.append(len(votes["options"]))
+            questions.append({**static, "answers": answers, "votes": votes})
+
+        # Rebuild the player store slot by slot
+        slot_ids: Dict[int, str] = {}
+        for player_id, slot in ids_raw.items():
+            slot_ids[int(slot)] = player_id.decode()
+            saved.player_ids[player_id.decode()] = int(slot)
+        players = PlayerStore()
+        for slot in sorted(int(slot) for slot in players_raw):
+            encoded = players_raw[str(slot).encode()].decode()
+            nickname, score, voted_question, online = json.loads(encoded)
+            player_id = slot_ids.get(slot, f"slot:{slot}")
+            players[player_id] = {"nickname": nickname, "score": score, "voted_question": voted_question,
+                                  "slot": slot, "online": online}
+            if slot not in slot_ids:
+                del players[player_id]  # A slot whose player id was retired
+            saved.players[slot] = encoded
+
+        slots = [nickname.decode() for nickname in slots_raw]
+        saved.num_slots = len(slots)
+        saved.nicknames = {nickname.decode(): pid.decode() for nickname, pid in nicknames_raw.items()}
+
+        session = {field: json.loads(value) for field, value in saved.meta.items() if field in _META_FIELDS}
+        session.update({
+            "questions": questions,
+            "players": players,
+            "slots": slots,
+            "nicknames": dict(saved.nicknames),
+        })
+        self._saved[session_code] = saved
+        return session
+
+    async def save_session(self, session_code: str, data: QuizSession) -> None:
+        key = self._key
+        saved = self._saved.get(session_code)
+        pipe = self._redis.pipeline(transaction=True)
+
+        if saved is None or saved.num_questions != len(data["questions"]):
+            # Nothing known about this session in this process: write it from scratch
+            saved = _SavedState()
+            pipe.delete(*[key(session_code, name) for name in
+                          ("meta", "questions", "players", "player_ids", "slots", "nicknames")])
+            static = [{k: v for k, v in question.items() if k not in ("answers", "votes")}
+                      for question in data["questions"]]
+            pipe.set(key(session_code, "questions"), json.dumps(static))
+            self._questions[session_code] = static
+            for q, question in enumerate(data["questions"]):
+                pipe.delete(key(session_code, "answers", q), key(session_code, "votes", q))
+            saved.num_questions = len(data["questions"])
+            saved.answers = [[0] * len(question["options"]) for question in data["questions"]]
+            saved.vote_counts = [0] * len(data["questions"])
+
+        # Scalar fields
+        meta = {field: json.dumps(data.get(field)) for field in _META_FIELDS}
+        changed = {field: value for field, value in meta.items() if saved.meta.get(field) != value}
+        changed["last_active"] = json.dumps(time.time())
+        pipe.hset(key(session_code, "meta"), mapping=changed)
+        saved.meta = meta
+
+        # Vote counters and vote rows: only the increments and the new rows
+        for q, question in enumerate(data["questions"]):
+            for option, count in enumerate(question["answers"]):
+                delta = count - saved.answers[q][option]
+                if delta:
+                    pipe.hincrby(key(session_code, "answers", q), option, delta)
+            saved.answers[q] = list(question["answers"])
+
+            num_votes = len(question["votes"]["options"])
+            if num_votes > saved.vote_counts[q]:
+                pipe.append(key(session_code, "votes", q), _pack_votes(question["votes"], saved.vote_counts[q]))
+                saved.vote_counts[q] = num_votes
+
+        # Players: rows that changed, plus id -> slot moves (reconnects)
+        rows = {}
+        player_ids = {}
+        for player_id, player in data["players"].items():
+            slot = player["slot"]
+            player_ids[player_id] = slot
+            encoded = _encode_player(player)
+            if saved.players.get(slot) != encoded:
+                rows[slot] = encoded
+        if rows:
+            pipe.hset(key(session_code, "players"), mapping=rows)
+            saved.players.update(rows)
+
+        new_ids = {pid: slot for pid, slot in player_ids.items() if saved.player_ids.get(pid) != slot}
+        if new_ids:
+            pipe.hset(key(session_code, "player_ids"), mapping=new_ids)
+        removed_ids = [pid for pid in saved.player_ids if pid not in player_ids]
+        if removed_ids:
+            pipe.hdel(key(session_code, "player_ids"), *removed_ids)
+        saved.player_ids = player_ids
+
+        if len(data["slots"]) > saved.num_slots:
+            pipe.rpush(key(session_code, "slots"), *data["slots"][saved.num_slots:])
+            saved.num_slots = len(data["slots"])
+
+        new_nicknames = {name: pid for name, pid in data["nicknames"].items() if saved.nicknames.get(name) != pid}
+        if new_nicknames:
+            pipe.hset(key(session_code, "nicknames"), mapping=new_nicknames)
+        removed_nicknames = [name for name in saved.nicknames if name not in data["nicknames"]]
+        if removed_nicknames:
+            pipe.hdel(key(session_code, "nicknames"), *removed_nicknames)
+        saved.nicknames = dict(data["nicknames"])
+
+        await pipe.execute()
+        self._saved[session_code] = saved
+
+    async def session_exists(self, session_code: str) -> bool:
+        return bool(await self._redis.exists(self._key(session_code, "meta")))
+
+    async def create_session(self, session_code: str, data: QuizSession) -> bool:
+        # HSETNX reserves the code: of several workers creating the same code,
+        # exactly one sees the meta key missing and writes the session
+        if not await self._redis.hsetnx(self._key(session_code, "meta"), "state", json.dumps(data["state"])):
+            return False
+        self._saved.pop(session_code, None)
+        await self.save_session(session_code, data)
+        return True
+
+    async def _static_questions(self, session_code: str) -> Optional[list]:
+        questions = self._questions.get(session_code)
+        if questions is None:
+            raw = await self._redis.get(self._key(session_code, "questions"))
+            if raw is None:
+                return None
+            questions = self._questions[session_code] = json.loads(raw)
+        return questions
+
+    async def _load_player(self, session_code: str, player_id: str, client=None):
+        """Returns (slot, [nickname, score, voted_question, online]) or None."""
+        client = client or self._redis
+        slot = await client.hget(self._key(session_code, "player_ids"), player_id)
+        if slot is None:
+            return None
+        row = await client.hget(self._key(session_code, "players"), slot)
+        return (int(slot), json.loads(row)) if row is not None else None
+
+    async def _transaction(self, session_code: str, names, func):
+        """Runs `func(pipe)` as a WATCH/MULTI transaction on the session's `names` keys.
+
+        `func` reads through the pipe, then calls `pipe.multi()` before
+        queueing its writes; if another client changes a watched key in
+        between, the writes are discarded and `func` runs again. Returns what
+        `func` returned.
+        """
+        keys = [self._key(session_code, name) for name in names]
+        return await self._redis.transaction(func, *keys, value_from_callable=True)
+
+    async def get_public_view(self, session_code: str, player_ids: Iterable[str] = ()) -> Optional[PublicView]:
+        key = self._key
+        meta_raw = await self._redis.hgetall(key(session_code, "meta"))
+        questions = await self._static_questions(session_code)
+        if not meta_raw or questions is None:
+            return None
+        meta = {field.decode(): json.loads(value) for field, value in meta_raw.items()}
+        meta = {field: value for field, value in meta.items() if field in _META_FIELDS}
+
+        index = meta["current_question_index"]
+        player_ids = list(player_ids)
+        pipe = self._redis.pipeline(transaction=False)
+        has_question = 0 <= index < len(questions)
+        if has_question:
+            pipe.hgetall(key(session_code, "answers", index))
+        if player_ids:
+            pipe.hmget(key(session_code, "player_ids"), player_ids)
+        results = await pipe.execute()
+
+        question = None
+        if has_question:
+            current = questions[index]
+            answers = [0] * len(current["options"])
+            for option, count in results.pop(0).items():
+                answers[int(option)] = int(count)
+            question = {"text": current["text"], "options": current["options"],
+                        "answers": answers, "correct_answer": current["correct_answer"]}
+
+        nicknames: Dict[str, str] = {}
+        if player_ids:
+            found = [(pid, slot) for pid, slot in zip(player_ids, results.pop(0)) if slot is not None]
+            if found:
+                rows = await self._redis.hmget(key(session_code, "players"), [slot for _, slot in found])
+                nicknames = {pid: json.loads(row)[0] for (pid, _), row in zip(found, rows) if row is not None}
+
+        return {**meta, "total_questions": len(questions), "question": question, "nicknames": nicknames}
+
+    async def upsert_player(self, session_code: str, player_id: str, nickname: str,
+                            presenter: bool = False) -> Optional[PlayerUpsert]:
+        key = self._key
+
+        async def upsert(pipe):
+            presenter_raw = await pipe.hget(key(session_code, "meta"), "presenter")
+            if presenter_raw is None:
+                return None
+            current_presenter = json.loads(presenter_raw)
+
+            existing_id = await pipe.hget(key(session_code, "nicknames"), nickname)
+            existing = await self._load_player(session_code, existing_id.decode(), pipe) if existing_id else None
+            if existing is not None:
+                existing_id = existing_id.decode()
+                slot, row = existing
+                if row[3]:
+                    return {"status": "taken", "replaced_id": existing_id, "score": row[1]}
+                # Reconnection: the player keeps their slot, score and votes
+                row[3] = True
+                pipe.multi()
+                pipe.hset(key(session_code, "players"), slot, json.dumps(row))
+                pipe.hdel(key(session_code, "player_ids"), existing_id)
+                pipe.hset(key(session_code, "player_ids"), player_id, slot)
+                pipe.hset(key(session_code, "nicknames"), nickname, player_id)
+                if current_presenter == existing_id:
+                    pipe.hset(key(session_code, "meta"), "presenter", json.dumps(player_id))
+                pipe.hset(key(session_code, "meta"), "last_active", json.dumps(time.time()))
+                return {"status": "reconnected", "replaced_id": existing_id, "score": row[1]}
+
+            # The slot list is watched, so the slot stays ours until EXEC
+            slot = await pipe.llen(key(session_code, "slots"))
+            pipe.multi()
+            pipe.rpush(key(session_code, "slots"), nickname)
+            pipe.hset(key(session_code, "players"), slot, json.dumps([nickname, 0, -1, True]))
+            pipe.hset(key(session_code, "player_ids"), player_id, slot)
+            pipe.hset(key(session_code, "nicknames"), nickname, player_id)
+            if presenter or current_presenter is None:
+                pipe.hset(key(session_code, "meta"), "presenter", json.dumps(player_id))
+            pipe.hset(key(session_code, "meta"), "last_active", json.dumps(time.time()))
+            return {"status": "joined", "replaced_id": None, "score": 0}
+
+        result = await self._transaction(session_code, ("meta", "nicknames", "players", "player_ids", "slots"),
+                                         upsert)
+        if result is not None and result["status"] != "taken":
+            self._saved.pop(session_code, None)
+        return result
+
+    async def set_player_online(self, session_code: str, player_id: str, online: bool) -> Optional[str]:
+        async def set_online(pipe):
+            player = await self._load_player(session_code, player_id, pipe)
+            if player is None:
+                return None
+            slot, row = player
+            row[3] = online
+            pipe.multi()
+            pipe.hset(self._key(session_code, "players"), slot, json.dumps(row))
+            pipe.hset(self._key(session_code, "meta"), "last_active", json.dumps(time.time()))
+            return row[0]
+
+        nickname = await self._transaction(session_code, ("player_ids", "players"), set_online)
+        if nickname is not None:
+            self._saved.pop(session_code, None)
+        return nickname
+
+    async def record_vote(self, session_code: str, player_id: str, question_index: int, option_index: int,
+                          time_taken: float, points: int) -> Optional[int]:
+        questions = await self._static_questions(session_code)
+        if questions is None or not 0 <= question_index < len(questions):
+            return None
+        if not 0 <= option_index < len(questions[question_index]["options"]):
+            return None
+
+        async def vote(pipe):
+            player = await self._load_player(session_code, player_id, pipe)
+            if player is None:
+                return None
+            slot, row = player
+            if row[2] == question_index:
+                return None
+            row[1] += points
+            row[2] = question_index
+            pipe.multi()
+            pipe.hincrby(self._key(session_code, "answers", question_index), option_index, 1)
+            pipe.append(self._key(session_code, "votes", question_index),
+                        _VOTE_ROW.pack(slot, option_index, time_taken, points))
+            pipe.hset(self._key(session_code, "players"), slot, json.dumps(row))
+            pipe.hset(self._key(session_code, "meta"), "last_active", json.dumps(time.time()))
+            return row[1]
+
+        score = await self._transaction(session_code, ("player_ids", "players"), vote)
+        if score is not None:
+            self._saved.pop(session_code, None)
+        return score
+
+    async def transition_state(self, session_code: str, state: QuizState, question_index: Optional[int] = None,
+                               from_state: Optional[QuizState] = None, from_index: Optional[int] = None,
+                               question_start_time: Optional[float] = None,
+                               quiz_start_time: Optional[float] = None) -> bool:
+        meta_key = self._key(session_code, "meta")
+
+        async def transition(pipe):
+            current_state, current_index = await pipe.hmget(meta_key, ["state", "current_question_index"])
+            if current_state is None:
+                return False
+            if from_state is not None and json.loads(current_state) != from_state:
+                return False
+            if from_index is not None and json.loads(current_index) != from_index:
+                return False
+            changes = {"state": json.dumps(state), "last_active": json.dumps(time.time())}
+            if question_index is not None:
+                changes["current_question_index"] = json.dumps(question_index)
+            if question_start_time is not None:
+                changes["question_start_time"] = json.dumps(question_start_time)
+            if quiz_start_time is not None:
+                changes["quiz_start_time"] = json.dumps(quiz_start_time)
+            pipe.multi()
+            pipe.hset(meta_key, mapping=changes)
+            return True
+
+        # The guard and the write are one transaction: a transition applied by
+        # another worker in between makes this one re-check its guard
+        changed = await self._transaction(session_code, ("meta",), transition)
+        if changed:
+            self._saved.pop(session_code, None)
+        return changed
+
+    async def set_question_timer(self, session_code: str, timer: QuestionTimer) -> bool:
+        meta_key = self._key(session_code, "meta")
+
+        async def set_timer(pipe):
+            current_state, current_index = await pipe.hmget(meta_key, ["state", "current_question_index"])
+            if current_state is None or json.loads(current_state) != "QUESTION":
+                return False
+            if json.loads(current_index) != timer["question_index"]:
+                return False
+            pipe.multi()
+            pipe.hset(meta_key, mapping={"question_timer": json.dumps(timer),
+                                         "last_active": json.dumps(time.time())})
+            return True
+
+        changed = await self._transaction(session_code, ("meta",), set_timer)
+        if changed:
+            self._saved.pop(session_code, None)
+        return changed
+
+    async def delete_session(self, session_code: str) -> None:
+        questions = await self._static_questions(session_code) or []
+        keys = [self._key(session_code, name) for name in
+                ("meta", "questions", "players", "player_ids", "slots", "nicknames")]
+        for q in range(len(questions)):
+            keys += [self._key(session_code, "answers", q), self._key(session_code, "votes", q)]
+        await self._redis.delete(*keys)
+        self._saved.pop(session_code, None)
+        self._questions.pop(session_code, None)
+
+    async def list_session_usage(self) -> List[SessionUsage]:
+        codes = [meta_key.decode().split(":")[1] async for meta_key in self._redis.scan_iter(match="quiz:*:meta")]
+        pipe = self._redis.pipeline(transaction=False)
+        for session_code in codes:
+            pipe.hmget(self._key(session_code, "meta"), ["state", "last_active"])
+        usage = []
+        for session_code, (state, last_active) in zip(codes, await pipe.execute()):
+            if state is None:
+                continue
+            usage.append({
+                "session_code": session_code,
+                "state": json.loads(state),
+                # Sessions written before activity was tracked count as active now
+                "last_active": json.loads(last_active) if last_active else time.time(),
+                # Redis enforces its own memory limit (maxmemory)
+                "bytes": None,
+            })
+        usage.sort(key=lambda entry: entry["last_active"])
+        return usage
+
+    async def recover(self) -> List[str]:
+        # Sessions live in Redis; only the worker-local caches start empty
+        return [entry["session_code"] for entry in await self.list_session_usage()]
+
 # --- Global Storage Instance ---
-# The rest of our application will import this `storage` object.
-# To switch to Redis, you would simply change this one line:
-# storage: QuizStorage = RedisStorage()
-# ...and all other application code would work without modification.
+# The rest of our application imports this `storage` object. Set
+# STORAGE_BACKEND=redis (and REDIS_URL) to use Redis instead of memory, or
+# SESSION_JOURNAL_DIR to keep in-memory sessions across restarts; all other
+# application code works without modification.
 
-storage: QuizStorage = MemoryStorage()
\ No newline at end of file
+if os.getenv("STORAGE_BACKEND", "memory") == "redis":
+    storage: QuizStorage = RedisStorage(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+elif os.getenv("SESSION_JOURNAL_DIR"):
+    storage: QuizStorage = JournaledStorage(os.getenv("SESSION_JOURNAL_DIR"),
+                                            int(os.getenv("SESSION_SNAPSHOT_EVERY", "50000")))
+else:
+    storage: QuizStorage = MemoryStorage()
@@ -0,0 +1,131 @@
+# tests/test_redis_storage.py
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from player_store import PlayerStore  # noqa: E402
+from storage import RedisStorage, new_question_votes  # noqa: E402
+
+# --- Concurrent RedisStorage writers ---
+# Two RedisStorage instances on one server stand in for two workers. Every
+# reply yields to the event loop first, so their reads and writes interleave
+# the way they do between processes. Each test sets up its session through
+# `_start`, which also opens every worker's connection: a connection's
+# handshake would otherwise delay the second worker until the first is done.
+
+
+from fakeredis.aioredis import FakeAsyncRedisConnection, FakeRedis  # noqa: E402
+
+
+class _InterleavingConnection(FakeAsyncRedisConnection):
+    async def read_response(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return await super().read_response(*args, **kwargs)
+
+
+def _workers(count=2):
+    server = fakeredis.FakeServer()
+    workers = []
+    for _ in range(count):
+        client = FakeRedis(server=server, connection_class=_InterleavingConnection)
+        workers.append(RedisStorage(client=client))
+    return workers
+
+
+async def _start(session):
+    workers = _workers()
+    await workers[0].save_session("ABCD", session)
+    for worker in workers:
+        await worker.get_session("ABCD")
+    return workers
+
+
+def _session(state="LOBBY", index=-1):
+    return {
+        "presenter": None, "state": state, "current_question_index": index,
+        "questions": [
+            {"text": f"q{i}", "options": ["a", "b"], "answers": [0, 0], "votes": new_question_votes(),
+             "correct_answer": "a", "tags": []}
+            for i in range(3)
+        ],
+        "players": PlayerStore(), "slots": [], "nicknames": {}, "timer": 30,
+        "question_start_time": 0.0, "quiz_name": "test", "quiz_start_time": None,
+    }
+
+
+def test_same_nickname_joins_once():
+    async def run():
+        first, second = await _start(_session())
+        results = await asyncio.gather(first.upsert_player("ABCD", "p1", "alice"),
+                                       second.upsert_player("ABCD", "p2", "alice"))
+        session = await first.get_session("ABCD")
+        return results, session
+
+    results, session = asyncio.run(run())
+    assert sorted(result["status"] for result in results) == ["joined", "taken"]
+    assert session["slots"] == ["alice"]
+    assert len(session["players"]) == 1
+
+
+def test_distinct_players_get_distinct_slots():
+    async def run():
+        first, second = await _start(_session())
+        await asyncio.gather(first.upsert_player("ABCD", "p1", "alice"),
+                             second.upsert_player("ABCD", "p2", "bob"))
+        return await first.get_session("ABCD")
+
+    session = asyncio.run(run())
+    assert sorted(session["slots"]) == ["alice", "bob"]
+    assert sorted(player["slot"] for player in session["players"].values()) == [0, 1]
+
+
+@pytest.mark.parametrize("expiry_first", [True, False])
+def test_timer_expiry_does_not_overwrite_next_question(expiry_first):
+    async def run():
+        first, second = await _start(_session("QUESTION", 0))
+        # Worker 1 expires question 0 while worker 2 moves on to question 1
+        expire = first.transition_state("ABCD", "RESULTS", from_state="QUESTION", from_index=0)
+        advance = second.transition_state("ABCD", "QUESTION", 1, from_index=0, question_start_time=1.0)
+        calls = (expire, advance) if expiry_first else (advance, expire)
+        await asyncio.gather(*calls)
+        return await first.get_public_view("ABCD")
+
+    public = asyncio.run(run())
+    # Either order is valid (expiry first, then next_question from RESULTS, or
+    # next_question first and the expiry's guard fails); a mix of both is not
+    assert (public["state"], public["current_question_index"]) == ("QUESTION", 1)
+    assert public["question_start_time"] == 1.0
+
+
+def test_player_votes_once():
+    async def run():
+        first, second = await _start(_session("QUESTION", 0))
+        await first.upsert_player("ABCD", "p1", "alice")
+        scores = await asyncio.gather(first.record_vote("ABCD", "p1", 0, 0, 1.0, 900),
+                                      second.record_vote("ABCD", "p1", 0, 1, 1.0, 0))
+        return scores, await first.get_session("ABCD")
+
+    scores, session = asyncio.run(run())
+    assert scores.count(None) == 1
+    assert sum(session["questions"][0]["answers"]) == 1
+
+
+def test_session_code_is_created_once():
+    async def run():
+        first, second = _workers()
+        for worker in (first, second):
+            await worker.session_exists("ABCD")  # Opens the connection
+        created = await asyncio.gather(first.create_session("ABCD", _session()),
+                                       second.create_session("ABCD", _session("QUESTION", 0)))
+        return created, await first.get_public_view("ABCD")
+
+    created, public = asyncio.run(run())
+    assert sorted(created) == [False, True]
+    assert public["state"] == ("LOBBY" if created[0] else "QUESTION")
@@ -1,7 +1,135 @@
+import os
 import random
 import string
+from collections import deque
+from typing import Deque, Set, TypedDict
 
+from sharding import shard_for
 
-def generate_session_code(length: int = 4) -> str:
-    """Generates a random, uppercase session code."""
-    return "".join(random.choices(string.ascii_uppercase, k=length)) 
\ No newline at end of file
+
+# --- Session Code Allocation ---
+# Instead of drawing random codes and asking storage whether each is taken,
+# codes of the current length are handed out in a keyed pseudo-random order:
+# a bijection on [0, 26^length) walked by a cursor, so every code comes up
+# exactly once and allocation is O(1) with no storage round-trips. Codes of
+# evicted sessions go to a free pool that is used once the sequence is spent.
+# When more than `max_occupancy` of the codes of the current length are live,
+# the allocator moves on to one letter longer codes (up to `max_length`).
+# In sharded mode (see sharding.py) a shard only hands out the codes that
+# hash to itself, and its capacity is its share of the code space.
+
+class _Permutation:
+    """A keyed pseudo-random bijection on range(size): a Feistel network with cycle walking."""
+
+    _ROUNDS = 4
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self._half = (bits + 1) // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = [rng.getrandbits(32) for _ in range(self._ROUNDS)]
+
+    def _round(self, value: int, key: int) -> int:
+        value = ((value ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+        return (value ^ (value >> 15)) & self._mask
+
+    def __call__(self, index: int) -> int:
+        value = index
+        while True:
+            left, right = value >> self._half, value & self._mask
+            for key in self._keys:
+                left, right = right, left ^ self._round(right, key)
+            value = (left << self._half) | right
+            # The network permutes a power-of-two range; walk until back inside [0, size)
+            if value < self.size:
+                return value
+
+
+class AllocatorStats(TypedDict):
+    length: int       # Length of newly allocated codes
+    live: int
+    capacity: int     # Number of codes of the current length this shard may hand out
+    occupancy: float
+    free: int         # Released codes waiting to be reused
+    shard: int
+
+
+class SessionCodeAllocator:
+    """Hands out session codes that are guaranteed not to be in use."""
+
+    def __init__(self, min_length: int = 4, max_length: int = 6, max_occupancy: float = 0.5,
+                 shard_index: int = 0, shard_count: int = 1):
+        self.max_length = max(min_length, max_length)
+        self.max_occupancy = max_occupancy
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self._rng = random.Random()  # Seeded from the OS; keeps the code order unpredictable
+        self._live: Set[str] = set()
+        self._free: Deque[str] = deque()
+        self._start_length(min_length)
+
+    def _start_length(self, length: int):
+        self.length = length
+        self._space = len(string.ascii_uppercase) ** length
+        self.capacity = self._space // self.shard_count
+        self._permutation = _Permutation(self._space, self._rng)
+        self._cursor = 0
+
+    def _encode(self, number: int) -> str:
+        letters = []
+        for _ in range(self.length):
+            number, digit = divmod(number, 26)
+            letters.append(string.ascii_uppercase[digit])
+        return "".join(letters)
+
+    def allocate(self) -> str:
+        """Returns a free session code and marks it live."""
+        if len(self._live) >= self.max_occupancy * self.capacity and self.length < self.max_length:
+            print(f"Session codes over {self.max_occupancy:.0%} occupied; growing to {self.length + 1} letters.")
+            self._start_length(self.length + 1)
+
+        while True:
+            if self._cursor < self._space:
+                code = self._encode(self._permutation(self._cursor))
+                self._cursor += 1
+                if self.shard_count > 1 and shard_for(code, self.shard_count) != self.shard_index:
+                    continue  # Owned by another shard
+            elif self._free:
+                code = self._free.popleft()
+            else:
+                raise RuntimeError("No free session codes left")
+            # Skips codes reserved by sessions that existed before this allocator
+            if code not in self._live:
+                self._live.add(code)
+                return code
+
+    def reserve(self, session_code: str):
+        """Marks a code that is already in use (e.g. by a recovered session) as live."""
+        self._live.add(session_code)
+
+    def release(self, session_code: str):
+        """Returns the code of a deleted session to the free pool."""
+        if session_code in self._live:
+            self._live.remove(session_code)
+            self._free.append(session_code)
+
+    def get_stats(self) -> AllocatorStats:
+        return {
+            "length": self.length,
+            "live": len(self._live),
+            "capacity": self.capacity,
+            "occupancy": len(self._live) / self.capacity,
+            "free": len(self._free),
+            "shard": self.shard_index,
+        }
+
+
+session_codes = SessionCodeAllocator(
+    min_length=int(os.getenv("SESSION_CODE_LENGTH", "4")),
+    max_length=int(os.getenv("SESSION_CODE_MAX_LENGTH", "6")),
+    max_occupancy=float(os.getenv("SESSION_CODE_MAX_OCCUPANCY", "0.5")),
+    # Set by sharding.py for each shard process
+    shard_index=int(os.getenv("SHARD_INDEX", "0")),
+    shard_count=int(os.getenv("SHARD_COUNT", "1")),
+)
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
@@ -17,6 +17,16 @@ interface Question {
   tags: string[];
 }
 
+interface QuestionPage {
+  questions: Question[];
+  next_cursor: string | null;
+}
+
+// Questions fetched per page; "Load more" fetches the next one
+const PAGE_SIZE = 50;
+// How long typing pauses before the search is sent to the server
+const SEARCH_DELAY_MS = 300;
+
 interface QuestionBankProps {
   selectedQuestions: string[];
   onQuestionsChange: (questionHashes: string[]) => void;
@@ -24,7 +34,11 @@ interface QuestionBankProps {
 
 const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProps) => {
   const [questions, setQuestions] = useState<Question[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const loadId = useRef(0);
   const [searchTerm, setSearchTerm] = useState('');
+  const [search, setSearch] = useState('');
   const [selectedTags, setSelectedTags] = useState<string[]>([]);
   const [availableTags, setAvailableTags] = useState<string[]>([]);
   const [isAddDialogOpen, setIsAddDialogOpen] = useState(false);
@@ -35,13 +49,6 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
     tags: ''
   });
 
-  const filteredQuestions = questions.filter(q => {
-    const matchesSearch = q.text && q.text.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesTags = selectedTags.length === 0 || 
-      selectedTags.some(tag => q.tags && q.tags.includes(tag.toLowerCase()));
-    return matchesSearch && matchesTags;
-  });
-
   const handleAddQuestion = async (e: React.FormEvent) => {
     e.preventDefault();
     
@@ -117,19 +124,27 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
     }
   };
 
-  const fetchQuestions = async () => {
-    // This would be implemented when backend is ready
-    // For now, using mock data
+  // Loads the first page for the selected tags and search (reset) or the page after the loaded ones
+  const fetchQuestions = async (reset = true) => {
+    const id = reset ? ++loadId.current : loadId.current;
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (selectedTags.length > 0) params.set('tags', selectedTags.join(','));
+    if (search) params.set('search', search);
+    if (!reset && nextCursor) params.set('cursor', nextCursor);
+
+    setIsLoadingMore(!reset);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/question-bank`);
+      const response = await fetch(`${API_BASE_URL}/api/question-bank?${params}`);
       if(response.ok) {
-        const data = await response.json();
-        console.log('Fetched questions:', data);
-        setQuestions(data);
+        const page: QuestionPage = await response.json();
+        if (id !== loadId.current) return;  // The filters changed while this page was loading
+        setQuestions(prev => reset ? page.questions : [...prev, ...page.questions]);
+        setNextCursor(page.next_cursor);
       }
     } catch(e) {
-      // ignore
       console.error('Failed to fetch questions:', e);
+    } finally {
+      setIsLoadingMore(false);
     }
   };
 
@@ -153,11 +168,25 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
     );
   };
 
-  const handleSelectAllByTag = (tag: string) => {
-    const questionsWithTag = filteredQuestions.filter(q => 
-      q.tags && q.tags.includes(tag.toLowerCase())
-    );
-    
+  // Selects every question in the bank with the tag (within the current search), not just the loaded pages
+  const handleSelectAllByTag = async (tag: string) => {
+    const params = new URLSearchParams({ tags: tag, all: 'true' });
+    if (search) params.set('search', search);
+
+    let questionsWithTag: Question[];
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/question-bank?${params}`);
+      if (!response.ok) {
+        toast({ title: "Error", description: "Failed to load questions", variant: "destructive" });
+        return;
+      }
+      questionsWithTag = await response.json();
+    } catch (error) {
+      console.error('Error loading questions by tag:', error);
+      toast({ title: "Error", description: "Network error", variant: "destructive" });
+      return;
+    }
+
     const questionHashesWithTag = questionsWithTag.map(q => q.hash);
     const newSelectedQuestions = [...selectedQuestions];
     
@@ -176,14 +205,25 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
         title: "Questions Selected!", 
         description: `Added ${newlyAdded.length} question${newlyAdded.length !== 1 ? 's' : ''} with tag "${tag}"` 
       });
+    } else {
+      toast({ title: "Already selected", description: `All questions with tag "${tag}" are already selected` });
     }
   };
 
   useEffect(() => {
-    fetchQuestions();
     fetchTags();
   }, []);
 
+  useEffect(() => {
+    const timeout = setTimeout(() => setSearch(searchTerm.trim()), SEARCH_DELAY_MS);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
+
+  // Tag filters and search are applied by the server, so every page matches them
+  useEffect(() => {
+    fetchQuestions();
+  }, [selectedTags, search]);
+
   return (
     <Card className="bg-white border-slate-200">
       <CardHeader className="flex flex-row items-center justify-between">
@@ -274,57 +314,43 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
           <div className="space-y-2">
             <Label className="text-slate-700 text-sm font-medium">Filter by Tags</Label>
             <div className="flex flex-wrap gap-2">
-              {availableTags.map((tag) => {
-                const questionsWithTag = filteredQuestions.filter(q => 
-                  q.tags && q.tags.includes(tag.toLowerCase())
-                );
-                const selectedQuestionsWithTag = questionsWithTag.filter(q => 
-                  selectedQuestions.includes(q.hash)
-                );
-                
-                return (
-                  <div key={tag} className="flex items-center gap-1">
-                    <button
-                      type="button"
-                      onClick={() => handleTagToggle(tag)}
-                      className={`px-3 py-1 text-xs rounded-full border transition-colors ${
-                        selectedTags.includes(tag)
-                          ? 'bg-blue-100 border-blue-300 text-blue-700'
-                          : 'bg-slate-100 border-slate-300 text-slate-600 hover:bg-slate-200'
-                      }`}
-                    >
-                      {tag}
-                    </button>
-                    {questionsWithTag.length > 0 && (
-                      <button
-                        type="button"
-                        onClick={() => handleSelectAllByTag(tag)}
-                        className={`px-2 py-1 text-xs rounded-full border transition-colors ${
-                          selectedQuestionsWithTag.length === questionsWithTag.length
-                            ? 'bg-green-100 border-green-300 text-green-700'
-                            : 'bg-orange-100 border-orange-300 text-orange-700 hover:bg-orange-200'
-                        }`}
-                        title={`Select all ${questionsWithTag.length} question${questionsWithTag.length !== 1 ? 's' : ''} with tag "${tag}"`}
-                      >
-                        {selectedQuestionsWithTag.length === questionsWithTag.length ? 'All' : `+${questionsWithTag.length}`}
-                      </button>
-                    )}
-                  </div>
-                );
-              })}
+              {availableTags.map((tag) => (
+                <div key={tag} className="flex items-center gap-1">
+                  <button
+                    type="button"
+                    onClick={() => handleTagToggle(tag)}
+                    className={`px-3 py-1 text-xs rounded-full border transition-colors ${
+                      selectedTags.includes(tag)
+                        ? 'bg-blue-100 border-blue-300 text-blue-700'
+                        : 'bg-slate-100 border-slate-300 text-slate-600 hover:bg-slate-200'
+                    }`}
+                  >
+                    {tag}
+                  </button>
+                  {/* Counts of loaded questions would undercount, so the bank is asked on click */}
+                  <button
+                    type="button"
+                    onClick={() => handleSelectAllByTag(tag)}
+                    className="px-2 py-1 text-xs rounded-full border transition-colors bg-orange-100 border-orange-300 text-orange-700 hover:bg-orange-200"
+                    title={`Select all questions with tag "${tag}"${search ? ' matching the search' : ''}`}
+                  >
+                    +All
+                  </button>
+                </div>
+              ))}
             </div>
           </div>
         )}
 
-        {filteredQuestions.length === 0 ? (
+        {questions.length === 0 ? (
           <div className="text-center py-8 text-slate-500">
             <BookOpen className="w-12 h-12 mx-auto mb-4 opacity-50" />
-            <p>{searchTerm ? 'No questions found' : 'No questions in bank yet'}</p>
+            <p>{search || selectedTags.length > 0 ? 'No questions found' : 'No questions in bank yet'}</p>
             <p className="text-sm">Add questions to reuse them across multiple quizzes</p>
           </div>
         ) : (
           <div className="space-y-3 max-h-60 overflow-y-auto">
-            {filteredQuestions.map((question) => (
+            {questions.map((question) => (
               <div
                 key={question.hash}
                 className={`p-3 rounded-lg border cursor-pointer transition-all ${
@@ -384,6 +410,21 @@ const QuestionBank = ({ selectedQuestions, onQuestionsChange }: QuestionBankProp
           </div>
         )}
 
+        {nextCursor && (
+          <div className="flex justify-center">
+            <Button
+              type="button"
+              variant="outline"
+              size="sm"
+              disabled={isLoadingMore}
+              onClick={() => fetchQuestions(false)}
+              className="border-slate-300 text-slate-700 hover:bg-slate-50"
+            >
+              {isLoadingMore ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
+
         {selectedQuestions.length > 0 && (
           <div className="mt-4 p-3 bg-green-50 border border-green-200 rounded-lg">
             <p className="text-green-700 text-sm font-medium">
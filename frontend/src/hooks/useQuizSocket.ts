@@ -10,23 +10,49 @@ export interface QuizState {
   question_index?: number;
   total_questions?: number;
   timer?: number;
+  // Authoritative remaining time of the running question, in seconds
+  time_left?: number;
+  timer_paused?: boolean;
   results?: Record<string, number>;
   correct_answer?: string;
   scores?: Record<string, { score: number }>;
+  // The recipient's own standing; audience payloads only carry the top players
+  me?: { rank: number; score: number } | null;
 }
 
+// Applies a JSON merge patch (RFC 7386) from a delta message to the last known state
+const applyMergePatch = (target: any, patch: any): any => {
+  if (patch === null || typeof patch !== 'object' || Array.isArray(patch)) {
+    return patch;
+  }
+  const result = target && typeof target === 'object' && !Array.isArray(target) ? { ...target } : {};
+  for (const [key, value] of Object.entries(patch)) {
+    if (value === null) {
+      delete result[key];
+    } else {
+      result[key] = applyMergePatch(result[key], value);
+    }
+  }
+  return result;
+};
+
 export const useQuizSocket = (sessionCode: string, nickname?: string) => {
   const [state, setState] = useState<QuizState | null>(null);
   const [isConnected, setIsConnected] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [joinError, setJoinError] = useState<string | null>(null);
   const ws = useRef<WebSocket | null>(null);
+  const seq = useRef<number | null>(null);
+  const syncedState = useRef<QuizState | null>(null);
   const reconnectAttempts = useRef(0);
   const maxReconnectAttempts = 5;
 
   const connect = useCallback(() => {
     try {
-      const wsUrl = `${API_BASE_URL.replace(/^http/, 'ws')}/ws/${sessionCode}`;
+      // Delta protocol: one full snapshot, then only the changes, with sequence numbers
+      const wsUrl = `${API_BASE_URL.replace(/^http/, 'ws')}/ws/${sessionCode}?protocol=delta`;
+      seq.current = null;
+      syncedState.current = null;
 
       console.log('Connecting to WebSocket:', wsUrl);
       ws.current = new WebSocket(wsUrl);
@@ -55,6 +81,42 @@ export const useQuizSocket = (sessionCode: string, nickname?: string) => {
             return;
           }
           
+          if (data.type === 'snapshot') {
+            seq.current = data.seq;
+            syncedState.current = { ...data.state, me: data.me };
+            setState(syncedState.current);
+            return;
+          }
+
+          // Only this player's own rank/score changed; it is not sequenced
+          if (data.type === 'me') {
+            if (syncedState.current) {
+              syncedState.current = { ...syncedState.current, me: data.me };
+              setState(syncedState.current);
+            }
+            return;
+          }
+
+          if (data.type === 'delta') {
+            // Waiting for a snapshot; it supersedes any delta in flight
+            if (seq.current === null) {
+              return;
+            }
+            // Missed or out-of-order update: ask the server for a fresh snapshot
+            if (data.seq !== seq.current + 1) {
+              seq.current = null;
+              ws.current?.send(JSON.stringify({ type: 'resync' }));
+              return;
+            }
+            seq.current = data.seq;
+            syncedState.current = applyMergePatch(syncedState.current, data.patch);
+            if ('me' in data) {
+              syncedState.current = { ...syncedState.current, me: data.me };
+            }
+            setState(syncedState.current);
+            return;
+          }
+
           // Handle regular state updates
           setState(data);
         } catch (error) {
@@ -109,10 +171,24 @@ export const useQuizSocket = (sessionCode: string, nickname?: string) => {
     sendMessage({ type: 'next_question' });
   }, [sendMessage]);
 
-  const vote = useCallback((option: string) => {
-    sendMessage({ type: 'vote', option });
+  const pauseTimer = useCallback(() => {
+    sendMessage({ type: 'pause_timer' });
+  }, [sendMessage]);
+
+  const resumeTimer = useCallback(() => {
+    sendMessage({ type: 'resume_timer' });
+  }, [sendMessage]);
+
+  const extendTimer = useCallback((seconds: number = 10) => {
+    sendMessage({ type: 'extend_timer', seconds });
   }, [sendMessage]);
 
+  const vote = useCallback((option: string) => {
+    // The server counts votes by option index
+    const index = state?.options?.indexOf(option) ?? -1;
+    sendMessage({ type: 'vote', option: index >= 0 ? index : option });
+  }, [sendMessage, state]);
+
   useEffect(() => {
     connect();
     
@@ -131,6 +207,9 @@ export const useQuizSocket = (sessionCode: string, nickname?: string) => {
     startQuiz,
     showResults,
     nextQuestion,
+    pauseTimer,
+    resumeTimer,
+    extendTimer,
     vote,
   };
 };
@@ -34,7 +34,11 @@ const AudienceView = () => {
   // Timer countdown effect
   useEffect(() => {
     if (state?.state === 'QUESTION' && state.timer) {
-      setTimeLeft(state.timer);
+      // Count down from the server's remaining time when it is sent
+      setTimeLeft(Math.ceil(state.time_left ?? state.timer));
+      if (state.timer_paused) {
+        return;
+      }
       const interval = setInterval(() => {
         setTimeLeft((prev) => {
           if (prev === null || prev <= 1) {
@@ -47,7 +51,7 @@ const AudienceView = () => {
 
       return () => clearInterval(interval);
     }
-  }, [state?.state, state?.timer, state?.question_index]);
+  }, [state?.state, state?.timer, state?.question_index, state?.time_left, state?.timer_paused]);
 
   const handleVote = (option: string) => {
     if (!hasVoted) {
@@ -82,8 +86,9 @@ const AudienceView = () => {
     </div>;
   }
 
-  const myScore = state.players[nickname]?.score || 0;
-  const myRank = Object.entries(state.players)
+  // The server sends our own standing since `players` only holds the top of the leaderboard
+  const myScore = state.me?.score ?? state.players[nickname]?.score ?? 0;
+  const myRank = state.me?.rank ?? Object.entries(state.players)
     .sort(([,a], [,b]) => b.score - a.score)
     .findIndex(([player]) => player === nickname) + 1;
 
@@ -3,14 +3,14 @@ import { useQuizSocket } from '@/hooks/useQuizSocket';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
-import { Users, Play, BarChart3, ArrowRight, Trophy, Clock } from 'lucide-react';
+import { Users, Play, Pause, BarChart3, ArrowRight, Trophy, Clock } from 'lucide-react';
 import { Progress } from '@/components/ui/progress';
 import { useEffect, useState } from 'react';
 
 const PresenterView = () => {
   const { sessionCode } = useParams<{ sessionCode: string }>();
   const navigate = useNavigate();
-  const { state, isConnected, error, joinError, startQuiz, showResults, nextQuestion } = useQuizSocket(sessionCode!, 'Presenter');
+  const { state, isConnected, error, joinError, startQuiz, showResults, nextQuestion, pauseTimer, resumeTimer, extendTimer } = useQuizSocket(sessionCode!, 'Presenter');
   const [timeLeft, setTimeLeft] = useState<number | null>(null);
 
   // Handle join errors - redirect to home
@@ -24,7 +24,11 @@ const PresenterView = () => {
   // Timer countdown effect
   useEffect(() => {
     if (state?.state === 'QUESTION' && state.timer) {
-      setTimeLeft(state.timer);
+      // Count down from the server's remaining time when it is sent
+      setTimeLeft(Math.ceil(state.time_left ?? state.timer));
+      if (state.timer_paused) {
+        return;
+      }
       const interval = setInterval(() => {
         setTimeLeft((prev) => {
           if (prev === null || prev <= 1) {
@@ -37,7 +41,7 @@ const PresenterView = () => {
 
       return () => clearInterval(interval);
     }
-  }, [state?.state, state?.timer, state?.question_index]);
+  }, [state?.state, state?.timer, state?.question_index, state?.time_left, state?.timer_paused]);
 
   if (!sessionCode) {
     return <div className="min-h-screen flex items-center justify-center bg-red-50">
@@ -172,7 +176,22 @@ const PresenterView = () => {
         </CardContent>
       </Card>
 
-      <div className="text-center">
+      <div className="text-center space-x-3">
+        <Button
+          onClick={state.timer_paused ? resumeTimer : pauseTimer}
+          variant="outline"
+          className="border-white/50 text-white bg-white/10 hover:bg-white/20 py-3 px-6 rounded-xl"
+        >
+          {state.timer_paused ? <Play className="w-5 h-5 mr-2" /> : <Pause className="w-5 h-5 mr-2" />}
+          {state.timer_paused ? 'Resume' : 'Pause'}
+        </Button>
+        <Button
+          onClick={() => extendTimer(10)}
+          variant="outline"
+          className="border-white/50 text-white bg-white/10 hover:bg-white/20 py-3 px-6 rounded-xl"
+        >
+          +10s
+        </Button>
         <Button 
           onClick={showResults}
           className="bg-gradient-to-r from-orange-500 to-red-500 hover:from-orange-600 hover:to-red-600 text-white font-semibold py-3 px-6 rounded-xl"